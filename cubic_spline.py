@@ -8,25 +8,21 @@ This script has several functions:
 - Estimate a cubic spline for abscissa, ordinate = datetime, float
 - Plot the raw data as a scatter plot
 - Plot the cubic spline as a line plot
+- Plot bootstrap percentile bands for the cubic spline
 
 time -f "%e" ./cubic_spline.py
 ./cubic_spline.py
 """
 
-from typing import Callable, NoReturn, Tuple
-from datetime import datetime
+from typing import NoReturn, Tuple
 
-from matplotlib.ticker import NullFormatter, NullLocator
-from matplotlib.dates import DateFormatter, DayLocator
 import matplotlib.pyplot as plt
+import spline_tools as st
+import figure_cache as fc
 import datasense as ds
 import pandas as pd
 
 
-def date_parser() -> Callable:
-    return lambda s: datetime.strptime(s, "%Y-%m-%d %H:%M:%S")
-
-
 colour1 = "#0077bb"
 colour2 = "#33bbee"
 parser = "%Y-%m-%d %H:%M:%S"
@@ -60,9 +56,14 @@ graph_file_name = [
     "cubic_spline_dataframe_small_datetime_integer",
     "cubic_spline_dataframe_small_integer_integer"
 ]
-date_time_parser = [None, date_parser(), date_parser(), None]
+date_time_parser = [None, parser, parser, None]
 date_formatter = [None, "%m-%d", "%m-%d", None]
-column_names_sort = [False, False, False, False]
+# workers > 1 fits the series in a process pool
+workers = 1
+# replicates > 0 plots bootstrap bands; method is "pairs" or "residuals"
+bootstrap_replicates = 0
+bootstrap_method = "pairs"
+band_percentiles = (2.5, 97.5)
 figure_width_height = (8, 6)
 x_axis_label = "Abscissa"
 y_axis_label = "Ordinate"
@@ -70,67 +71,56 @@ axis_title = "Cubic Spline"
 
 
 def main():
-    for (
-        filename,
-        abscissaname,
-        ordinatename,
-        ordinatepredictedname,
-        datetimeparser,
-        columnnamessort,
-        dateformatter,
-        graphfilename
-    ) in zip(
-        file_name,
-        abscissa_name,
-        ordinate_name,
-        ordinate_predicted_name,
-        date_time_parser,
-        column_names_sort,
+    fits = st.fit_batch(
+        specs=[
+            st.SeriesSpec(
+                file_name=filename,
+                abscissa=abscissaname,
+                ordinate=ordinatename,
+                predicted=ordinatepredictedname,
+                date_format=datetimeparser,
+                abscissa_dtype="int" if datetimeparser is None else None,
+                report=True
+            )
+            for filename, abscissaname, ordinatename, ordinatepredictedname,
+            datetimeparser in zip(
+                file_name,
+                abscissa_name,
+                ordinate_name,
+                ordinate_predicted_name,
+                date_time_parser
+            )
+        ],
+        workers=workers
+    )
+    for fit, dateformatter, graphfilename in zip(
+        fits,
         date_formatter,
         graph_file_name
     ):
-        data = ds.read_file(
-            file_name=filename,
-            parse_dates=[abscissaname],
-            date_parser=datetimeparser,
-            sort_columns=[abscissaname],
-            sort_columns_bool=[columnnamessort]
-        )
-        data = ds.dataframe_info(
-            df=data,
-            file_in=filename
-        )
-        if datetimeparser is not None:
-            data[abscissaname] = pd.to_numeric(data[abscissaname])
-            print("filename: ", filename)
-            spline = ds.cubic_spline(
-                df=data,
-                abscissa=abscissaname,
-                ordinate=ordinatename
-            )
-            data[ordinatepredictedname] = spline(data[abscissaname])
-            data[abscissaname] = data[abscissaname]\
-                .astype(dtype="datetime64[ns]")
-        else:
-            data[abscissaname] = data[abscissaname].astype(dtype="int")
-            print("filename: ", filename)
-            spline = ds.cubic_spline(
-                df=data,
-                abscissa=abscissaname,
-                ordinate=ordinatename
+        print("filename: ", fit.spec.file_name, "seconds: ", fit.seconds)
+        bands = None
+        if bootstrap_replicates:
+            bands = st.bootstrap_bands(
+                x=fit.data[fit.spec.abscissa].to_numpy(),
+                y=fit.data[fit.spec.ordinate].to_numpy(),
+                replicates=bootstrap_replicates,
+                percentiles=band_percentiles,
+                method=bootstrap_method,
+                workers=workers
             )
-            data[ordinatepredictedname] = spline(data[abscissaname])
         plot_graph(
-            data,
-            abscissaname,
-            ordinatename,
-            ordinatepredictedname,
+            fit.data,
+            fit.spec.abscissa,
+            fit.spec.ordinate,
+            fit.spec.predicted,
             figure_width_height,
             dateformatter,
             graphfilename,
             axis_title,
             x_axis_label,
-            y_axis_label
+            y_axis_label,
+            bands=bands
         )
 
 
@@ -144,32 +134,69 @@ def plot_graph(
     graphname: str,
     graphtitle: str,
     xaxislabel: str,
-    yaxislabel: str
+    yaxislabel: str,
+    bands: st.SplineBands = None
 ) -> NoReturn:
+    file_name = f"{graphname}.svg"
+    key = fc.figure_key(
+        df[columnx],
+        df[columny],
+        df[columnz],
+        *(() if bands is None else (bands.lower, bands.upper)),
+        figurewidthheight=figurewidthheight,
+        dateformat=dateformat,
+        graphtitle=graphtitle,
+        xaxislabel=xaxislabel,
+        yaxislabel=yaxislabel,
+        colours=(colour1, colour2),
+        format="svg",
+        code=fc.source_key(plot_graph)
+    )
+    if fc.restore_figure(key=key, file_name=file_name):
+        return
     fig, ax = plt.subplots(
         nrows=1,
         ncols=1,
         figsize=figurewidthheight
     )
+    x = df[columnx].to_numpy()
+    width, height = fig.get_size_inches() * fig.dpi
+    markers = st.marker_index(
+        x=x,
+        y=df[columny].to_numpy(),
+        columns=int(width),
+        rows=int(height)
+    )
+    line = st.line_index(
+        x=x,
+        y=df[columnz].to_numpy(),
+        columns=2 * int(width)
+    )
+    if bands is not None:
+        ax.fill_between(
+            bands.grid,
+            bands.lower,
+            bands.upper,
+            color=colour2,
+            alpha=0.3,
+            linewidth=0
+        )
     ax.plot(
-        df[columnx],
-        df[columny],
+        x[markers],
+        df[columny].to_numpy()[markers],
         marker=".",
         linestyle="",
         color=colour1
     )
     ax.plot(
-        df[columnx],
-        df[columnz],
+        x[line],
+        df[columnz].to_numpy()[line],
         marker=None,
         linestyle="-",
         color=colour2
     )
     if dateformat:
-        ax.xaxis.set_major_locator(DayLocator())
-        ax.xaxis.set_minor_locator(NullLocator())
-        ax.xaxis.set_major_formatter(DateFormatter(dateformat))
-        ax.xaxis.set_minor_formatter(NullFormatter())
+        st.set_date_axis(ax=ax, x=x, dateformat=dateformat)
     ax.set_title(
         label=graphtitle,
 
@@ -184,9 +211,10 @@ def plot_graph(
     )
     ds.despine(ax=ax)
     fig.savefig(
-        fname=f"{graphname}.svg",
+        fname=file_name,
         format="svg"
     )
+    fc.store_figure(key=key, file_name=file_name)
 
 
 if __name__ == "__main__":
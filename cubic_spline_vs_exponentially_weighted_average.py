@@ -3,13 +3,32 @@
 Plots to compare cubic spline vs exponentially weighted moving average fits
 """
 
-from datetime import datetime
-from typing import Callable, NoReturn
+from typing import Iterable, Iterator, List, NamedTuple, NoReturn, Tuple
+from pathlib import Path
+import tempfile
+import json
+import time
+import io
 
 from scipy.interpolate import CubicSpline
+from scipy.signal import lfilter
 import matplotlib.pyplot as plt
+import spline_tools as st
 import datasense as ds
 import pandas as pd
+import numpy as np
+
+
+class EwmaState(NamedTuple):
+    """
+    What an online EWMA needs to continue: the smoothed value, the sum of
+    the decayed weights, the timestamp (int64 ns) of the last row, and the
+    byte offset in the file after that row
+    """
+    smoothed: float
+    weight: float
+    timestamp: int
+    offset: int
 
 
 def main():
@@ -19,35 +38,39 @@ def main():
     observed_column = "observed"
     colour1 = "#0077bb"
     colour2 = "#cc3311"
+    # workers > 1 fits the spline series in a process pool, or the segments
+    # of each series when segment_size is set
+    workers = 1
+    # series longer than segment_size points are fitted in stitched segments
+    segment_size = None
+    # incremental = True smooths only the rows appended to each file since
+    # the last run, starting from the EWMA state saved by that run
+    incremental = False
+    # sweep_alphas = np.linspace(0.01, 1, 100), say, compares the one-step
+    # forecast error of many smoothing constants in one pass per file
+    sweep_alphas = None
+    # benchmark_sizes = [10**3, 10**4, 10**5, 10**6, 10**7, 10**8], say, times
+    # every stage of both methods on synthetic series of those sizes
+    benchmark_sizes = None
+    # bucket = "1min" or "1h", say, fits bucket means instead of every raw
+    # observation and draws the bucket min-max as a band
+    bucket = None
     cs(
-        filename="dataframe_small_datetime_integer.csv",
-        datecolumn=date_time_column,
-        datetimeparser=date_time_parser,
-        observedcolumn=observed_column,
-        predictedcolumn=predicted_column,
-        graphname="cubic_spline",
-        colour_marker=colour1,
-        colour_line=colour2
-    )
-    cs(
-        filename="dataframe_large.csv",
+        filenames=[
+            "dataframe_small_datetime_integer.csv",
+            "dataframe_large.csv",
+            "dataframe_large_clean.csv"
+        ],
         datecolumn=date_time_column,
         datetimeparser=date_time_parser,
         observedcolumn=observed_column,
         predictedcolumn=predicted_column,
         graphname="cubic_spline",
         colour_marker=colour1,
-        colour_line=colour2
-    )
-    cs(
-        filename="dataframe_large_clean.csv",
-        datecolumn=date_time_column,
-        datetimeparser=date_time_parser,
-        observedcolumn=observed_column,
-        predictedcolumn=predicted_column,
-        graphname="cubic_spline",
-        colour_marker=colour1,
-        colour_line=colour2
+        colour_line=colour2,
+        workers=workers,
+        segment_size=segment_size,
+        bucket=bucket
     )
     ewma(
         filename="dataframe_small_datetime_integer.csv",
@@ -57,7 +80,9 @@ def main():
         predictedcolumn=predicted_column,
         graphname="ewma",
         colour_marker=colour1,
-        colour_line=colour2
+        colour_line=colour2,
+        incremental=incremental,
+        bucket=bucket
     )
     ewma(
         filename="dataframe_large.csv",
@@ -67,7 +92,9 @@ def main():
         predictedcolumn=predicted_column,
         graphname="ewma",
         colour_marker=colour1,
-        colour_line=colour2
+        colour_line=colour2,
+        incremental=incremental,
+        bucket=bucket
     )
     ewma(
         filename="dataframe_large_clean.csv",
@@ -77,38 +104,27 @@ def main():
         predictedcolumn=predicted_column,
         graphname="ewma",
         colour_marker=colour1,
-        colour_line=colour2
+        colour_line=colour2,
+        incremental=incremental,
+        bucket=bucket
     )
-
-
-def date_parser() -> Callable:
-    return lambda s: datetime.strptime(s, "%Y-%m-%d %H:%M:%S")
-
-
-def estimate_spline(
-    *,
-    df: pd.DataFrame,
-    columnx: str,
-    columny: str
-) -> CubicSpline:
-    """
-    Estimates the spline object for columnx, columny of a dataframe
-    Requires that columnx, columny be integer or float
-    Removes rows where there are missing values in columnx and columny
-    Removes duplicate rows
-    Sorts the dataframe by columnx in increasing order
-    """
-    df = ds.delete_empty_rows(
-        df=df,
-        list_columns=[columnx, columny]
-    )
-    df = df.sort_values(by=columnx, axis="rows", ascending=True)
-    df = df.drop_duplicates(subset=columnx, keep="first")
-    print("final dataframe", df.shape,
-          "min", df[columny].min(),
-          "max", df[columny].max())
-    spline = CubicSpline(df[columnx], df[columny])
-    return spline
+    if sweep_alphas is not None:
+        for filename in [
+            "dataframe_small_datetime_integer.csv",
+            "dataframe_large.csv",
+            "dataframe_large_clean.csv"
+        ]:
+            sweep(
+                filename=filename,
+                datecolumn=date_time_column,
+                datetimeparser=date_time_parser,
+                observedcolumn=observed_column,
+                alphas=sweep_alphas,
+                graphname="ewma_sweep",
+                colour_marker=colour1
+            )
+    if benchmark_sizes is not None:
+        benchmark(sizes=benchmark_sizes)
 
 
 def plot_graph(
@@ -132,20 +148,42 @@ def plot_graph(
         ncols=1,
         figsize=figsize
     )
+    x = df[columnx].to_numpy()
+    width, height = fig.get_size_inches() * fig.dpi
+    markers = st.marker_index(
+        x=x,
+        y=df[columny].to_numpy(),
+        columns=int(width),
+        rows=int(height)
+    )
+    line = st.line_index(
+        x=x,
+        y=df[columnz].to_numpy(),
+        columns=2 * int(width)
+    )
     ax.plot(
-        df[columnx],
-        df[columny],
+        x[markers],
+        df[columny].to_numpy()[markers],
         marker=".",
         linestyle="",
         color=colour_marker
     )
     ax.plot(
-        df[columnx],
-        df[columnz],
+        x[line],
+        df[columnz].to_numpy()[line],
         marker=None,
         linestyle="-",
         color=colour_line
     )
+    if {"min", "max"} <= set(df.columns):
+        ax.fill_between(
+            x,
+            df["min"],
+            df["max"],
+            color=colour_marker,
+            alpha=0.2,
+            linewidth=0
+        )
     ax.set_title(
         label=graphtitle + "\n" + graphsubtitle,
 
@@ -168,45 +206,51 @@ def plot_graph(
 
 def cs(
     *,
-    filename: str,
+    filenames: List[str],
     datecolumn: str,
     datetimeparser: str,
     observedcolumn: str,
     predictedcolumn: str,
     graphname: str,
     colour_marker: str,
-    colour_line: str
+    colour_line: str,
+    workers: int = 1,
+    segment_size: int = None,
+    bucket: str = None
 ) -> NoReturn:
-    df = ds.read_file(
-        file_name=filename,
-        parse_dates=[datecolumn],
-        date_parser=date_parser()
-    )
-    print("initial dataframe", df.shape,
-          "min", df[observedcolumn].min(),
-          "max", df[observedcolumn].max())
-    df[datecolumn] = pd.to_numeric(df[datecolumn])
-    spline = estimate_spline(
-        df=df,
-        columnx=datecolumn,
-        columny=observedcolumn
-    )
-    df[predictedcolumn] = spline(df[datecolumn])
-    df[datecolumn] = df[datecolumn].astype(dtype="datetime64[ns]")
-    plot_graph(
-        df=df,
-        columnx=datecolumn,
-        columny=observedcolumn,
-        columnz=predictedcolumn,
-        filename=filename,
-        graphname=graphname,
-        graphtitle="Cubic Spline Fit",
-        graphsubtitle=filename,
-        yaxislabel=observedcolumn,
-        xaxislabel=datecolumn,
-        colour_marker=colour_marker,
-        colour_line=colour_line
+    fits = st.fit_batch(
+        specs=[
+            st.SeriesSpec(
+                file_name=filename,
+                abscissa=datecolumn,
+                ordinate=observedcolumn,
+                predicted=predictedcolumn,
+                date_format=datetimeparser,
+                segment_size=segment_size,
+                bucket=bucket,
+                workers=1 if segment_size is None else workers
+            )
+            for filename in filenames
+        ],
+        # one pool at a time: across series, or across the segments of each
+        workers=workers if segment_size is None else 1
     )
+    for fit in fits:
+        print(fit.spec.file_name, "seconds", fit.seconds)
+        plot_graph(
+            df=fit.data,
+            columnx=datecolumn,
+            columny=observedcolumn,
+            columnz=predictedcolumn,
+            filename=fit.spec.file_name,
+            graphname=graphname,
+            graphtitle="Cubic Spline Fit",
+            graphsubtitle=fit.spec.file_name,
+            yaxislabel=observedcolumn,
+            xaxislabel=datecolumn,
+            colour_marker=colour_marker,
+            colour_line=colour_line
+        )
 
 
 def ewma(
@@ -218,17 +262,63 @@ def ewma(
     predictedcolumn: str,
     graphname: str,
     colour_marker: str,
-    colour_line: str
+    colour_line: str,
+    alpha: float = 1,
+    incremental: bool = False,
+    bucket: str = None
 ) -> NoReturn:
-    df = ds.read_file(
-        file_name=filename,
-        parse_dates=[datecolumn],
-        date_parser=date_parser()
+    """
+    With incremental = True, only the rows appended to filename since the
+    last run are read, smoothed from the saved state, and plotted
+    With a bucket width, the bucket means are smoothed instead of the raw
+    observations
+    """
+    if incremental:
+        state_file = f"{Path(filename).stem}_ewma_state.json"
+        state = load_ewma_state(state_file=state_file, alpha=alpha)
+        df, offset = read_appended(
+            file_name=filename,
+            offset=0 if state is None else state.offset
+        )
+    else:
+        state = None
+        df = ds.read_file(file_name=filename)
+    df[datecolumn] = st.parse_dates(
+        series=df[datecolumn],
+        date_format=datetimeparser,
+        file_name=filename
     )
+    if state is not None:
+        df = df[st.as_int64(df[datecolumn].to_numpy()) > state.timestamp]
     print("initial & final", df.shape,
           "min", df[observedcolumn].min(),
           "max", df[observedcolumn].max())
-    df[predictedcolumn] = df[observedcolumn].ewm(alpha=1).mean()
+    if bucket is not None and not df.empty:
+        df = st.resample_buckets(
+            df=df,
+            columnx=datecolumn,
+            columny=observedcolumn,
+            bucket=bucket
+        )
+    if incremental:
+        if df.empty:
+            print("no rows appended to", filename)
+            return
+        df[predictedcolumn], state = update_ewma(
+            values=df[observedcolumn].to_numpy(dtype=np.float64),
+            alpha=alpha,
+            state=state
+        )
+        save_ewma_state(
+            state_file=state_file,
+            state=state._replace(
+                timestamp=int(st.as_int64(df[datecolumn].to_numpy())[-1]),
+                offset=offset
+            ),
+            alpha=alpha
+        )
+    else:
+        df[predictedcolumn] = df[observedcolumn].ewm(alpha=alpha).mean()
     plot_graph(
         df=df,
         columnx=datecolumn,
@@ -245,5 +335,422 @@ def ewma(
     )
 
 
+def update_ewma(
+    *,
+    values: np.ndarray,
+    alpha: float,
+    state: EwmaState = None
+) -> Tuple[np.ndarray, EwmaState]:
+    """
+    Continues an EWMA over new values from state, or starts one when state
+    is None
+    The result equals pd.Series.ewm(alpha=alpha).mean() over the whole
+    history: the weighted sum and the weight sum both follow
+    s[t] = v[t] + (1 - alpha) * s[t - 1], computed with one lfilter call
+    each; missing values decay the sums without adding to them, and where
+    the weight has decayed to zero (alpha = 1) the last smoothed value is
+    carried forward
+    Returns the smoothed values and the state after the last value
+    """
+    decay = 1 - alpha
+    if state is None:
+        state = EwmaState(smoothed=np.nan, weight=0.0, timestamp=0, offset=0)
+    present = ~np.isnan(values)
+    weighted_sum, _ = lfilter(
+        b=[1.0],
+        a=[1.0, -decay],
+        x=np.where(present, values, 0.0),
+        zi=[decay * state.smoothed * state.weight if state.weight else 0.0]
+    )
+    weight, _ = lfilter(
+        b=[1.0],
+        a=[1.0, -decay],
+        x=present.astype(np.float64),
+        zi=[decay * state.weight]
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        smoothed = weighted_sum / weight
+    smoothed = carry_forward(
+        smoothed=smoothed,
+        weight=weight,
+        initial=state.smoothed
+    )
+    return smoothed, state._replace(
+        smoothed=float(smoothed[-1]),
+        weight=float(weight[-1]) if weight[-1] else state.weight
+    )
+
+
+def stream_ewma(
+    *,
+    values: Iterable[float],
+    alpha: float,
+    state: EwmaState = None
+) -> Iterator[EwmaState]:
+    """
+    Smooths a live feed one value at a time
+    Yields the state after every value; state.smoothed is the EWMA, NaN
+    before the first valid value
+    """
+    if state is None:
+        state = EwmaState(smoothed=np.nan, weight=0.0, timestamp=0, offset=0)
+    decay = 1 - alpha
+    for value in values:
+        weighted_sum = decay * state.smoothed * state.weight \
+            if state.weight else 0.0
+        weight = decay * state.weight
+        if not np.isnan(value):
+            weighted_sum += value
+            weight += 1
+        if weight:
+            state = state._replace(
+                smoothed=weighted_sum / weight,
+                weight=weight
+            )
+        yield state
+
+
+def carry_forward(
+    *,
+    smoothed: np.ndarray,
+    weight: np.ndarray,
+    initial: float = np.nan
+) -> np.ndarray:
+    """
+    Replaces smoothed where weight is zero with the last smoothed value
+    where it was not, down each column, or with initial before that
+    """
+    rows = np.arange(len(smoothed)).reshape((-1,) + (1,) * (weight.ndim - 1))
+    last = np.maximum.accumulate(np.where(weight > 0, rows, -1), axis=0)
+    carried = np.take_along_axis(smoothed, np.maximum(last, 0), axis=0)
+    return np.where(last >= 0, carried, initial)
+
+
+def read_appended(
+    *,
+    file_name: str,
+    offset: int = 0
+) -> Tuple[pd.DataFrame, int]:
+    """
+    Reads the complete csv rows that follow byte offset in file_name
+    Returns the rows and the offset after the last complete row
+    """
+    with open(file_name, "rb") as file:
+        header = file.readline()
+        file.seek(max(offset, len(header)))
+        data = file.read()
+    end = data.rfind(b"\n") + 1
+    df = pd.read_csv(io.BytesIO(header + data[:end]))
+    return df, max(offset, len(header)) + end
+
+
+def load_ewma_state(*, state_file: str, alpha: float) -> EwmaState:
+    """
+    Returns the saved state, or None when there is no state for this alpha
+    """
+    if not Path(state_file).exists():
+        return None
+    with open(state_file) as file:
+        saved = json.load(file)
+    if saved.pop("alpha") != alpha:
+        return None
+    return EwmaState(**saved)
+
+
+def save_ewma_state(
+    *,
+    state_file: str,
+    state: EwmaState,
+    alpha: float
+) -> None:
+    with open(state_file, "w") as file:
+        json.dump({"alpha": alpha, **state._asdict()}, file)
+
+
+def sweep(
+    *,
+    filename: str,
+    datecolumn: str,
+    datetimeparser: str,
+    observedcolumn: str,
+    alphas: np.ndarray,
+    graphname: str,
+    colour_marker: str,
+    best: int = 3
+) -> pd.DataFrame:
+    """
+    Smooths the observations with every alpha at once, prints the one-step
+    forecast error of each alpha, and plots the best few
+    Returns the errors sorted from best to worst
+    """
+    df = ds.read_file(file_name=filename)
+    df[datecolumn] = st.parse_dates(
+        series=df[datecolumn],
+        date_format=datetimeparser,
+        file_name=filename
+    )
+    values = df[observedcolumn].to_numpy(dtype=np.float64)
+    smoothed = ewma_sweep(values=values, alphas=alphas)
+    errors = pd.DataFrame(
+        data={
+            "alpha": alphas,
+            "rmse": forecast_errors(values=values, smoothed=smoothed)
+        }
+    ).sort_values(by="rmse")
+    print(filename, "one-step forecast error by alpha")
+    print(errors.head(best * 3))
+    fig, ax = plt.subplots(
+        nrows=1,
+        ncols=1,
+        figsize=(8, 6)
+    )
+    ax.plot(
+        df[datecolumn],
+        values,
+        marker=".",
+        linestyle="",
+        color=colour_marker
+    )
+    for column in errors.index[:best]:
+        ax.plot(
+            df[datecolumn],
+            smoothed[:, column],
+            marker=None,
+            linestyle="-",
+            label=f"alpha = {alphas[column]:.3g}"
+        )
+    ax.legend(frameon=False)
+    ax.set_title(
+        label="Exponentially Weighted Moving Average Sweep\n" + filename
+    )
+    ax.set_xlabel(xlabel=datecolumn)
+    ax.set_ylabel(ylabel=observedcolumn)
+    ds.despine(ax=ax)
+    file = filename.strip(".csv")
+    fig.savefig(
+        fname=f"{graphname}_{file}.png",
+        format="png"
+    )
+    plt.close(fig)
+    return errors
+
+
+def ewma_sweep(
+    *,
+    values: np.ndarray,
+    alphas: np.ndarray
+) -> np.ndarray:
+    """
+    Computes pd.Series.ewm(alpha=alpha).mean() for every alpha at once
+    The recurrence s[t] = v[t] + (1 - alpha) * s[t - 1] is solved for the
+    weighted sum and the weight sum as a prefix scan over the n x k array:
+    each step adds the sums lag rows back, decayed by (1 - alpha)^lag, and
+    lag doubles until (1 - alpha)^lag is negligible for every alpha
+    Returns an n x k array, one column per alpha
+    """
+    decay = 1 - np.asarray(alphas, dtype=np.float64)
+    present = ~np.isnan(values)
+    weighted_sum = np.repeat(
+        np.where(present, values, 0.0)[:, np.newaxis],
+        len(decay),
+        axis=1
+    )
+    weight = np.repeat(
+        present.astype(np.float64)[:, np.newaxis],
+        len(decay),
+        axis=1
+    )
+    lag = 1
+    factor = decay
+    while lag < len(values) and factor.max() > np.finfo(np.float64).eps:
+        weighted_sum[lag:] = weighted_sum[lag:] + factor * weighted_sum[:-lag]
+        weight[lag:] = weight[lag:] + factor * weight[:-lag]
+        lag *= 2
+        factor = factor * factor
+    with np.errstate(invalid="ignore", divide="ignore"):
+        smoothed = weighted_sum / weight
+    return carry_forward(smoothed=smoothed, weight=weight)
+
+
+def forecast_errors(
+    *,
+    values: np.ndarray,
+    smoothed: np.ndarray
+) -> np.ndarray:
+    """
+    Root mean squared error of the smoothed value at t - 1 as a forecast of
+    the observation at t, one per column of smoothed
+    """
+    residuals = values[1:, np.newaxis] - smoothed[:-1]
+    return np.sqrt(np.nanmean(residuals ** 2, axis=0))
+
+
+def alphas_from(
+    *,
+    spans: Iterable[float] = (),
+    halflives: Iterable[float] = (),
+    coms: Iterable[float] = ()
+) -> np.ndarray:
+    """
+    Converts spans, half-lives, and centres of mass to smoothing constants,
+    as pd.Series.ewm does
+    """
+    return np.concatenate([
+        2 / (np.asarray(spans, dtype=np.float64) + 1),
+        1 - np.exp(-np.log(2) / np.asarray(halflives, dtype=np.float64)),
+        1 / (1 + np.asarray(coms, dtype=np.float64))
+    ])
+
+
+def benchmark(
+    *,
+    sizes: List[int],
+    noise: float = 0.1,
+    alpha: float = 0.1,
+    file_name: str = "benchmark.csv",
+    graphname: str = "benchmark",
+    seed: int = None
+) -> pd.DataFrame:
+    """
+    Times the read, clean, fit, evaluate, and plot stages of the cubic
+    spline and the EWMA on synthetic series of each size, and measures the
+    root mean squared error of each fit against the noise-free signal
+    Writes the results to file_name and a scaling chart to graphname.png
+    Returns the results, one row per size x method x stage
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            data_file = str(Path(directory) / f"points_{size}.csv")
+            signal = synthetic_series(size=size, noise=noise, seed=seed)
+            signal.drop(columns="signal").to_csv(data_file, index=False)
+            for method in ("cubic_spline", "ewma"):
+                seconds = {}
+                start = time.perf_counter()
+                df = ds.read_file(file_name=data_file)
+                df["datetime"] = st.parse_dates(
+                    series=df["datetime"],
+                    date_format="%Y-%m-%d %H:%M:%S"
+                )
+                seconds["read"] = time.perf_counter() - start
+                start = time.perf_counter()
+                x, y, _ = st.clean_series(
+                    x=df["datetime"].to_numpy(),
+                    y=df["observed"].to_numpy(dtype=np.float64)
+                )
+                seconds["clean"] = time.perf_counter() - start
+                start = time.perf_counter()
+                if method == "cubic_spline":
+                    spline = CubicSpline(x, y)
+                else:
+                    predicted, _ = update_ewma(values=y, alpha=alpha)
+                seconds["fit"] = time.perf_counter() - start
+                start = time.perf_counter()
+                if method == "cubic_spline":
+                    predicted = spline(x)
+                seconds["evaluate"] = time.perf_counter() - start
+                start = time.perf_counter()
+                df["predicted"] = predicted
+                plot_graph(
+                    df=df,
+                    columnx="datetime",
+                    columny="observed",
+                    columnz="predicted",
+                    filename=Path(data_file).name,
+                    graphname=f"{graphname}_{method}",
+                    graphtitle="Benchmark",
+                    graphsubtitle=f"{size} points",
+                    yaxislabel="observed",
+                    xaxislabel="datetime",
+                    colour_marker="#0077bb",
+                    colour_line="#cc3311"
+                )
+                plt.close("all")
+                seconds["plot"] = time.perf_counter() - start
+                rmse = np.sqrt(
+                    np.mean((predicted - signal["signal"].to_numpy()) ** 2)
+                )
+                rows += [
+                    {
+                        "size": size,
+                        "method": method,
+                        "stage": stage,
+                        "seconds": elapsed,
+                        "rmse": rmse
+                    }
+                    for stage, elapsed in seconds.items()
+                ]
+    results = pd.DataFrame(data=rows)
+    results.to_csv(file_name, index=False)
+    print(results)
+    plot_benchmark(results=results, graphname=graphname)
+    return results
+
+
+def synthetic_series(
+    *,
+    size: int,
+    noise: float = 0.1,
+    seed: int = None
+) -> pd.DataFrame:
+    """
+    Creates a sorted, one-second series of a slow sine signal plus normal
+    noise of standard deviation noise
+    """
+    rng = np.random.default_rng(seed)
+    phase = np.linspace(0, 20 * np.pi, size)
+    signal = np.sin(phase)
+    return pd.DataFrame(
+        data={
+            "datetime": pd.date_range(
+                start="2020-01-01", periods=size, freq="s"
+            ).strftime("%Y-%m-%d %H:%M:%S"),
+            "observed": signal + rng.normal(scale=noise, size=size),
+            "signal": signal
+        }
+    )
+
+
+def plot_benchmark(*, results: pd.DataFrame, graphname: str) -> None:
+    """
+    Plots seconds against size on log-log axes, one line per method and
+    stage, beside the error of each method against size
+    """
+    fig, (ax_time, ax_error) = plt.subplots(
+        nrows=1,
+        ncols=2,
+        figsize=(12, 6)
+    )
+    for (method, stage), group in results.groupby(["method", "stage"]):
+        ax_time.plot(
+            group["size"],
+            group["seconds"],
+            marker=".",
+            linestyle="-" if method == "cubic_spline" else "--",
+            label=f"{method} {stage}"
+        )
+    for method, group in results.groupby("method"):
+        group = group.drop_duplicates(subset="size")
+        ax_error.plot(
+            group["size"],
+            group["rmse"],
+            marker=".",
+            label=method
+        )
+    for ax, ylabel in ((ax_time, "Seconds"), (ax_error, "RMSE vs signal")):
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_xlabel(xlabel="Points")
+        ax.set_ylabel(ylabel=ylabel)
+        ax.legend(frameon=False, fontsize=8)
+        ds.despine(ax=ax)
+    fig.suptitle(t="Cubic spline vs EWMA scaling")
+    fig.savefig(
+        fname=f"{graphname}.png",
+        format="png"
+    )
+    plt.close(fig)
+
+
 if __name__ == "__main__":
     main()
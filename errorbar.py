@@ -5,13 +5,43 @@ Errorbar survey analysis
 ./errorbar.py
 """
 
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, NamedTuple, Tuple
+from pathlib import Path
 import time
-import math
 
 import matplotlib.pyplot as plt
+import matplotlib
 from scipy import stats
+import figure_cache as fc
 import datasense as ds
 import pandas as pd
+import numpy as np
+
+
+class Survey(NamedTuple):
+    """
+    Survey answers as one contiguous respondents x questions uint8 block,
+    with the question metadata and optional respondent weights kept beside it
+    """
+    responses: np.ndarray
+    supplier: np.ndarray
+    questions: List[str]
+    question_numbers: List[float]
+    question_columns: List[str]
+    weights: np.ndarray = None
+
+
+class SurveyCounts(NamedTuple):
+    """
+    Answer counts streamed from a survey export: the counts, the watermark
+    of the last row read, and, for a weight column, the weighted counts and
+    the squared-weight sums of every question
+    """
+    counts: np.ndarray
+    watermark: int
+    weighted_counts: np.ndarray = None
+    squared_weights: np.ndarray = None
 
 
 def main():
@@ -22,6 +52,47 @@ def main():
     header_title = 'risk_survey'
     header_id = 'risk-survey'
     graph_file_name = 'risk_survey_question'
+    # workers > 1 renders the question figures in a process pool
+    workers = 1
+    # survey_file = None creates a mock survey of size respondents; a .csv or
+    # .parquet export is read chunk_size rows at a time instead
+    survey_file = None
+    chunk_size = 100_000
+    # state_file saves the counts and row watermark of survey_file, so later
+    # runs fold in only rows appended since and redraw only changed questions;
+    # supplier_watermark = True uses the Supplier column as the watermark,
+    # for a numeric id that increases with file order
+    state_file = None
+    supplier_watermark = False
+    # weight_column names a design weight column of survey_file, whose
+    # weighted proportions are reported when weighted = True
+    weight_column = None
+    # figures whose inputs are unchanged are copied from figure_cache_dir
+    # instead of being redrawn; None disables the cache
+    figure_cache_dir = fc.CACHE_DIR
+    # number_bands = 4, say, adds a cross-tab of the questions by Supplier
+    # band; 0 leaves it out
+    number_bands = 0
+    crosstab_file_name = 'risk_survey_crosstab.csv'
+    # interval = 't' for t-intervals, 'bootstrap' for percentile bootstrap
+    # intervals from replicates multinomial resamples
+    interval = 't'
+    replicates = 10_000
+    # answers are coded 1..len(answer_labels), e.g. a 5-point Likert scale
+    # ['strongly disagree', 'disagree', 'neutral', 'agree', 'strongly agree']
+    answer_labels = ['no', 'yes']
+    number_categories = len(answer_labels)
+    # with more than two answers, the intervals of a question hold
+    # simultaneously (Bonferroni adjustment)
+    significance_level = 0.05
+    if number_categories > 2:
+        significance_level /= number_categories
+    # weighted = True reports design-weighted proportions (supplier spend in
+    # the mock survey, or weight_column of survey_file) beside the unweighted
+    # ones; segment_weights is an optional pd.Series of mock survey weights
+    # indexed by the number_bands Supplier bands
+    weighted = False
+    segment_weights = None
     questions = [
         'Business continuity plan',
         'Updated annually',
@@ -82,96 +153,151 @@ def main():
     print('This report is a mock-up.')
     number_questions = len(question_numbers)
     print('Number of questions: ', number_questions)
-    supplier = pd.Series(
-        data=list(range(1, size + 1, 1)),
-        name='Supplier'
-    )
-    data = create_dataframe(size=size)
-    data = pd.concat([data, supplier], axis=1)
-    ds.page_break()
-    for question, question_number, question_column in\
-            zip(questions, question_numbers, question_columns):
-        no = data[question_column].value_counts('1')[1]
-        yes = data[question_column].value_counts(['2'])[2]
-        fig, ax = plt.subplots(
-            nrows=1,
-            ncols=1,
-            figsize=figsize
+    changed = np.ones(number_questions, dtype=bool)
+    if survey_file is None:
+        survey = create_survey(
+            size=size,
+            questions=questions,
+            question_numbers=question_numbers,
+            question_columns=question_columns,
+            number_categories=number_categories
         )
-        ax.errorbar(
-            x=['1', '2'],
-            y=[no, yes],
-            yerr=[
-                stats.t.isf(q=.025, df=size-2) *
-                math.sqrt(no * (1 - no) / (
-                    data[question_column].value_counts()[1] +
-                    data[question_column].value_counts()[2]
-                )),
-                stats.t.isf(q=.025, df=size-2) *
-                math.sqrt(yes * (1 - yes) / (
-                    data[question_column].value_counts()[1] +
-                    data[question_column].value_counts()[2]
-                ))
-            ],
-            linestyle='None',
-            marker='o',
-            color='b',
-            ecolor='r',
-            markersize=4
+        print('Response matrix bytes: ', survey.responses.nbytes)
+        counts, proportions, half_widths = tally_responses(
+            responses=survey.responses,
+            number_categories=number_categories,
+            significance_level=significance_level
         )
-        ax.set_xlim(
-            left=-1,
-            right=2
+    else:
+        previous = None
+        if state_file is not None:
+            previous = load_tally_state(
+                state_file=state_file,
+                number_questions=number_questions,
+                number_categories=number_categories
+            )
+        tally = count_survey_file(
+            file_name=survey_file,
+            questions=questions,
+            question_numbers=question_numbers,
+            question_columns=question_columns,
+            number_categories=number_categories,
+            chunk_size=chunk_size,
+            previous=previous,
+            supplier_watermark=supplier_watermark,
+            weight_column=weight_column
         )
-        # ax.set_ylim(
-        #     left=0,
-        #     right=1
-        # )
-        ax.set_xlabel(
-            xlabel='Answer',
-            fontsize=12
+        counts = tally.counts
+        proportions, half_widths = summarize_counts(
+            counts=counts,
+            significance_level=significance_level
         )
-        ax.set_ylabel(
-            ylabel='Proportion',
-            fontsize=12
+        if state_file is not None:
+            save_tally_state(state_file=state_file, tally=tally)
+            changed = (counts != previous.counts).any(axis=1)
+            print('Questions changed: ', changed.sum())
+    print('Respondents: ', counts.sum(axis=1).max())
+    if interval == 'bootstrap':
+        yerrs = bootstrap_intervals(
+            counts=counts,
+            replicates=replicates,
+            significance_level=significance_level,
+            workers=workers
         )
-        ax.set_xticks(['1', '2'])
-        ax.set_xticklabels(['no', 'yes'])
-        fig.suptitle(
-            t=f'Question {question_number}\n{question}',
-            fontsize=15
+    else:
+        yerrs = half_widths
+    ds.page_break()
+    specs = [
+        {
+            'question': question,
+            'question_number': question_number,
+            'count': count,
+            'proportion': proportion,
+            'yerr': yerr,
+            'answer_labels': answer_labels,
+            'figsize': figsize,
+            'file_name': f'{graph_file_name}_{question_number}.svg',
+            'cache_dir': figure_cache_dir
+        }
+        for question, question_number, count, proportion, yerr in zip(
+            questions,
+            question_numbers,
+            counts,
+            proportions,
+            yerrs
         )
-        for proportion, count, x, y in zip(
-            [
-                data[question_column].value_counts('1')[1],
-                data[question_column].value_counts('2')[2]
-            ],
-            [
-                data[question_column].value_counts()[1],
-                data[question_column].value_counts()[2]
-            ],
-            ['1', '2'],
-            [no, yes]
-        ):
-            ax.annotate(
-                text=f'p = {proportion}',
-                xy=(x, y),
-                xytext=(10, 5),
-                textcoords="offset points"
+    ]
+    render_questions(
+        specs=[
+            spec for spec, question_changed in zip(specs, changed)
+            if question_changed or not Path(spec['file_name']).exists()
+        ],
+        workers=workers
+    )
+    for spec in specs:
+        ds.html_figure(file_name=spec['file_name'])
+    if weighted and (survey_file is None or weight_column is not None):
+        if survey_file is not None:
+            weighted_counts = tally.weighted_counts
+            squared_weights = tally.squared_weights
+        else:
+            if segment_weights is None:
+                weights = survey.weights
+            else:
+                weights = respondent_weights(
+                    keys=supplier_segments(
+                        supplier=survey.supplier,
+                        number_bands=number_bands
+                    ),
+                    weight_table=segment_weights
+                )
+            weighted_counts, squared_weights = weighted_sums(
+                responses=survey.responses,
+                weights=weights,
+                number_categories=number_categories
             )
-            ax.annotate(
-                text=f'n = {count}',
-                xy=(x, y),
-                xytext=(10, -5),
-                textcoords="offset points"
+        weighted_proportions, weighted_half_widths, effective_n = \
+            summarize_weighted(
+                weighted_counts=weighted_counts,
+                squared_weights=squared_weights,
+                significance_level=significance_level
             )
-        ds.despine(ax=ax)
-        fig.savefig(
-            fname=f'{graph_file_name}_{question_number}.svg',
-            format='svg'
+        ds.page_break()
+        print('Weighted and unweighted proportions')
+        print(
+            pd.DataFrame(
+                data={
+                    'Question': np.repeat(question_numbers, number_categories),
+                    'Answer': np.tile(answer_labels, number_questions),
+                    'n': counts.ravel(),
+                    'Proportion': proportions.ravel(),
+                    'Half width': half_widths.ravel(),
+                    'Effective n': np.repeat(effective_n, number_categories),
+                    'Weighted proportion': weighted_proportions.ravel(),
+                    'Weighted half width': weighted_half_widths.ravel()
+                }
+            ).to_string(index=False)
+        )
+    if survey_file is None and number_bands:
+        table = crosstab_survey(
+            survey=survey,
+            segments=supplier_segments(
+                supplier=survey.supplier,
+                number_bands=number_bands
+            ),
+            number_categories=number_categories,
+            significance_level=significance_level
+        )
+        table.to_csv(crosstab_file_name, index=False)
+        plot_crosstab(
+            table=table,
+            answer=number_categories,
+            file_name=f'{graph_file_name}_crosstab.svg',
+            figsize=figsize
         )
-        ds.html_figure(file_name=f'{graph_file_name}_{question_number}.svg')
-        plt.close()
+        ds.page_break()
+        print('Cross-tab by supplier segment: ', crosstab_file_name)
+        ds.html_figure(file_name=f'{graph_file_name}_crosstab.svg')
     stop_time = time.time()
     ds.page_break()
     ds.report_summary(
@@ -185,222 +311,721 @@ def main():
     )
 
 
-def create_dataframe(size: int) -> pd.DataFrame:
-    df = pd.DataFrame(
-        {
-            'Q01': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q02': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q03': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q04': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q05': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q06': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q07': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q08': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q09': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q10': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q11': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q12': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q13': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q14': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q15': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q16': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q17': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q18': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q19': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q20': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q21': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q22': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q23': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q24': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q25': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q26': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q27': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q28': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q29': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
-            ),
-            'Q30': ds.random_data(
-                distribution='randint',
-                size=size,
-                low=1,
-                high=3,
-                scale=1
+def render_questions(
+    *,
+    specs: List[dict],
+    workers: int = 1
+) -> List[str]:
+    """
+    Renders one errorbar figure per question spec
+    A spec holds only the precomputed numbers, so it is cheap to send to a
+    worker process
+    Returns the figure file names in the order of specs
+    """
+    if workers > 1:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=matplotlib.use,
+            initargs=('Agg',)
+        ) as executor:
+            return list(executor.map(render_question, specs))
+    return [render_question(spec) for spec in specs]
+
+
+def render_question(spec: dict) -> str:
+    """
+    Draws and saves the errorbar figure of one question
+    Returns the file name of the figure
+    """
+    question = spec['question']
+    question_number = spec['question_number']
+    count = spec['count']
+    proportion = spec['proportion']
+    yerr = spec['yerr']
+    answer_labels = spec['answer_labels']
+    answers = [str(answer) for answer in range(1, len(answer_labels) + 1)]
+    figsize = spec['figsize']
+    key = fc.figure_key(
+        count,
+        proportion,
+        yerr,
+        question=question,
+        question_number=question_number,
+        answer_labels=answer_labels,
+        figsize=figsize,
+        format='svg',
+        code=fc.source_key(render_question)
+    )
+    if fc.restore_figure(
+        key=key,
+        file_name=spec['file_name'],
+        cache_dir=spec['cache_dir']
+    ):
+        return spec['file_name']
+    fig, ax = plt.subplots(
+        nrows=1,
+        ncols=1,
+        figsize=figsize
+    )
+    ax.errorbar(
+        x=answers,
+        y=proportion,
+        yerr=yerr,
+        linestyle='None',
+        marker='o',
+        color='b',
+        ecolor='r',
+        markersize=4
+    )
+    ax.set_xlim(
+        left=-1,
+        right=len(answers)
+    )
+    # ax.set_ylim(
+    #     left=0,
+    #     right=1
+    # )
+    ax.set_xlabel(
+        xlabel='Answer',
+        fontsize=12
+    )
+    ax.set_ylabel(
+        ylabel='Proportion',
+        fontsize=12
+    )
+    ax.set_xticks(answers)
+    ax.set_xticklabels(answer_labels)
+    fig.suptitle(
+        t=f'Question {question_number}\n{question}',
+        fontsize=15
+    )
+    for p, n, x, y in zip(proportion, count, answers, proportion):
+        ax.annotate(
+            text=f'p = {p}',
+            xy=(x, y),
+            xytext=(10, 5),
+            textcoords="offset points"
+        )
+        ax.annotate(
+            text=f'n = {n}',
+            xy=(x, y),
+            xytext=(10, -5),
+            textcoords="offset points"
+        )
+    ds.despine(ax=ax)
+    fig.savefig(
+        fname=spec['file_name'],
+        format='svg'
+    )
+    plt.close(fig)
+    fc.store_figure(
+        key=key,
+        file_name=spec['file_name'],
+        cache_dir=spec['cache_dir']
+    )
+    return spec['file_name']
+
+
+def read_survey_chunks(
+    *,
+    file_name: str,
+    questions: List[str],
+    question_numbers: List[float],
+    question_columns: List[str],
+    chunk_size: int = 100_000,
+    supplier_column: str = 'Supplier',
+    weight_column: str = None
+) -> Iterator[Survey]:
+    """
+    Reads a .csv or .parquet survey export chunk_size rows at a time
+    Yields one compact Survey per chunk, so memory stays bounded by
+    chunk_size whatever the size of the file
+    weight_column names an optional design weight column
+    """
+    extra_columns = [supplier_column, weight_column]
+    if Path(file_name).suffix == '.parquet':
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(file_name)
+        columns = question_columns + [
+            column for column in extra_columns
+            if column in parquet_file.schema_arrow.names
+        ]
+        chunks = _number_rows(
+            batch.to_pandas()
+            for batch in parquet_file.iter_batches(
+                batch_size=chunk_size,
+                columns=columns
+            )
+        )
+    else:
+        chunks = pd.read_csv(
+            file_name,
+            usecols=lambda column: column in question_columns or
+            column in extra_columns,
+            chunksize=chunk_size
+        )
+    for chunk in chunks:
+        yield survey_from_dataframe(
+            df=chunk,
+            questions=questions,
+            question_numbers=question_numbers,
+            question_columns=question_columns,
+            supplier_column=supplier_column,
+            weight_column=weight_column
+        )
+
+
+def count_survey_file(
+    *,
+    file_name: str,
+    questions: List[str],
+    question_numbers: List[float],
+    question_columns: List[str],
+    number_categories: int = 2,
+    chunk_size: int = 100_000,
+    previous: SurveyCounts = None,
+    supplier_watermark: bool = False,
+    weight_column: str = None
+) -> SurveyCounts:
+    """
+    Streams a survey export and accumulates the answer counts of every
+    question, chunk by chunk
+    With previous counts, only rows above their watermark are folded in, so
+    rows counted by an earlier run are skipped. Rows are identified by their
+    running row number (from 1), or by the supplier id when
+    supplier_watermark is True, for a numeric id that increases with file
+    order.
+    Without previous counts the counts are identical to those of
+    count_responses on the whole file
+    With a weight_column, the weighted counts and squared-weight sums are
+    accumulated too, for summarize_weighted
+    Returns the counts, with the highest row number or supplier id read as
+    the watermark
+    """
+    shape = (len(question_columns), number_categories)
+    if previous is None:
+        previous = SurveyCounts(
+            counts=np.zeros(shape, dtype=np.int64),
+            watermark=None
+        )
+    watermark = previous.watermark
+    counts = previous.counts.copy()
+    if weight_column is not None:
+        if previous.weighted_counts is not None:
+            weighted_counts = previous.weighted_counts.copy()
+            squared_weights = previous.squared_weights.copy()
+        elif counts.any():
+            raise ValueError('the previous counts have no weighted counts')
+        else:
+            weighted_counts = np.zeros(shape)
+            squared_weights = np.zeros(len(question_columns))
+    rows = 0
+    highest = 0 if watermark is None else watermark
+    for survey in read_survey_chunks(
+        file_name=file_name,
+        questions=questions,
+        question_numbers=question_numbers,
+        question_columns=question_columns,
+        chunk_size=chunk_size,
+        weight_column=weight_column
+    ):
+        if supplier_watermark:
+            ids = survey.supplier.astype(np.int64)
+        else:
+            ids = np.arange(rows + 1, rows + len(survey.responses) + 1)
+        rows += len(survey.responses)
+        if len(ids):
+            highest = max(highest, int(ids.max()))
+        responses, weights = survey.responses, survey.weights
+        if watermark is not None:
+            new_rows = ids > watermark
+            responses = responses[new_rows]
+            if weights is not None:
+                weights = weights[new_rows]
+        counts += count_responses(
+            responses=responses,
+            number_categories=number_categories
+        )
+        if weight_column is not None:
+            chunk_weighted, chunk_squared = weighted_sums(
+                responses=responses,
+                weights=weights,
+                number_categories=number_categories
+            )
+            weighted_counts += chunk_weighted
+            squared_weights += chunk_squared
+    if weight_column is None:
+        return SurveyCounts(counts=counts, watermark=highest)
+    return SurveyCounts(
+        counts=counts,
+        watermark=highest,
+        weighted_counts=weighted_counts,
+        squared_weights=squared_weights
+    )
+
+
+def load_tally_state(
+    *,
+    state_file: str,
+    number_questions: int,
+    number_categories: int = 2
+) -> SurveyCounts:
+    """
+    Reads the counts saved by save_tally_state
+    Returns zero counts and a zero watermark when there is no state file yet
+    """
+    if not Path(state_file).exists():
+        return SurveyCounts(
+            counts=np.zeros(
+                (number_questions, number_categories),
+                dtype=np.int64
             ),
-        }
+            watermark=0
+        )
+    with np.load(state_file) as state:
+        return SurveyCounts(
+            counts=state['counts'],
+            watermark=int(state['watermark']),
+            weighted_counts=state.get('weighted_counts'),
+            squared_weights=state.get('squared_weights')
+        )
+
+
+def save_tally_state(
+    *,
+    state_file: str,
+    tally: SurveyCounts
+) -> None:
+    """
+    Saves the counts and watermark, and any weighted counts, to a small .npz
+    state file
+    """
+    arrays = {
+        name: value for name, value in tally._asdict().items()
+        if value is not None
+    }
+    with open(state_file, 'wb') as file:
+        np.savez(file, **arrays)
+
+
+def _number_rows(chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """
+    Gives consecutive chunks a running row index, as pd.read_csv does
+    """
+    start = 0
+    for chunk in chunks:
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        start += len(chunk)
+        yield chunk
+
+
+def tally_responses(
+    *,
+    responses: np.ndarray,
+    number_categories: int = 2,
+    significance_level: float = 0.05
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Tallies the answers of every question with a single np.bincount
+    responses is a respondents x questions array of answers coded
+    1..number_categories
+    Answers outside 1..number_categories are treated as missing
+    Returns counts, proportions, and t-interval half-widths, each of shape
+    questions x number_categories
+    """
+    counts = count_responses(
+        responses=responses,
+        number_categories=number_categories
+    )
+    proportions, half_widths = summarize_counts(
+        counts=counts,
+        significance_level=significance_level
+    )
+    return counts, proportions, half_widths
+
+
+def count_responses(
+    *,
+    responses: np.ndarray,
+    number_categories: int = 2,
+    chunk_size: int = 100_000,
+    groups: np.ndarray = None,
+    number_groups: int = 1,
+    weights: np.ndarray = None
+) -> np.ndarray:
+    """
+    Counts the answers of every question in one pass over the response matrix
+    Rows are widened to np.intp chunk_size rows at a time so that a uint8
+    matrix is never copied whole
+    Returns an integer array of shape questions x number_categories, or
+    number_groups x questions x number_categories when groups gives the
+    group code 0..number_groups - 1 of every respondent (-1 is skipped)
+    With respondent weights, the counts are the float sums of the weights
+    """
+    number_questions = responses.shape[1]
+    cells = number_questions * number_categories
+    offsets = np.arange(number_questions) * number_categories - 1
+    counts = np.zeros(
+        number_groups * cells,
+        dtype=np.int64 if weights is None else np.float64
+    )
+    for start in range(0, responses.shape[0], chunk_size):
+        chunk = responses[start:start + chunk_size]
+        valid = (chunk >= 1) & (chunk <= number_categories)
+        index = chunk.astype(np.intp) + offsets
+        if groups is not None:
+            group = groups[start:start + chunk_size, np.newaxis]
+            valid &= group >= 0
+            index += group * cells
+        if weights is None:
+            chunk_weights = None
+        else:
+            chunk_weights = np.broadcast_to(
+                weights[start:start + chunk_size, np.newaxis],
+                chunk.shape
+            )[valid]
+        counts += np.bincount(
+            index[valid],
+            weights=chunk_weights,
+            minlength=number_groups * cells
+        )
+    if groups is None:
+        return counts.reshape(number_questions, number_categories)
+    return counts.reshape(number_groups, number_questions, number_categories)
+
+
+def summarize_counts(
+    *,
+    counts: np.ndarray,
+    significance_level: float = 0.05,
+    effective_n: np.ndarray = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts a questions x categories count array (or groups x questions x
+    categories) into proportions and two-sided t-interval half-widths
+    effective_n replaces the per-question count total in the intervals, as
+    for weighted counts
+    """
+    total = counts.sum(axis=-1, keepdims=True)
+    proportions = counts / total
+    if effective_n is None:
+        n = total
+    else:
+        n = effective_n[..., np.newaxis]
+    t = stats.t.isf(q=significance_level / 2, df=n - 2)
+    half_widths = t * np.sqrt(proportions * (1 - proportions) / n)
+    return proportions, half_widths
+
+
+def weighted_tally(
+    *,
+    responses: np.ndarray,
+    weights: np.ndarray,
+    number_categories: int = 2,
+    significance_level: float = 0.05
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Tallies the weighted answers of every question with a weighted bincount
+    The intervals use the Kish effective sample size (sum w)^2 / sum w^2 of
+    the respondents who answered each question
+    Returns weighted counts, proportions, half-widths, and effective n
+    """
+    weighted_counts, squared_weights = weighted_sums(
+        responses=responses,
+        weights=weights,
+        number_categories=number_categories
+    )
+    proportions, half_widths, effective_n = summarize_weighted(
+        weighted_counts=weighted_counts,
+        squared_weights=squared_weights,
+        significance_level=significance_level
+    )
+    return weighted_counts, proportions, half_widths, effective_n
+
+
+def weighted_sums(
+    *,
+    responses: np.ndarray,
+    weights: np.ndarray,
+    number_categories: int = 2
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the weighted counts of every question and the sums of the
+    squared weights of the respondents who answered it
+    Both are sums, so they accumulate across chunks of respondents
+    """
+    weighted_counts = count_responses(
+        responses=responses,
+        number_categories=number_categories,
+        weights=weights
+    )
+    squared_weights = count_responses(
+        responses=responses,
+        number_categories=number_categories,
+        weights=weights ** 2
+    ).sum(axis=-1)
+    return weighted_counts, squared_weights
+
+
+def summarize_weighted(
+    *,
+    weighted_counts: np.ndarray,
+    squared_weights: np.ndarray,
+    significance_level: float = 0.05
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Converts weighted counts into proportions and t-interval half-widths
+    with the Kish effective sample size (sum w)^2 / sum w^2
+    Returns proportions, half-widths, and effective n
+    """
+    effective_n = weighted_counts.sum(axis=-1) ** 2 / squared_weights
+    proportions, half_widths = summarize_counts(
+        counts=weighted_counts,
+        significance_level=significance_level,
+        effective_n=effective_n
+    )
+    return proportions, half_widths, effective_n
+
+
+def respondent_weights(
+    *,
+    keys: np.ndarray,
+    weight_table: pd.Series
+) -> np.ndarray:
+    """
+    Looks up the weight of every respondent in a weight table
+    keys are the supplier ids, or the segment labels for a per-segment table
+    Respondents missing from the table get a weight of 0
+    """
+    return weight_table.reindex(keys).fillna(0).to_numpy(dtype=np.float64)
+
+
+def bootstrap_intervals(
+    *,
+    counts: np.ndarray,
+    replicates: int = 10_000,
+    significance_level: float = 0.05,
+    workers: int = 1,
+    seed: int = None
+) -> np.ndarray:
+    """
+    Percentile bootstrap intervals for the proportions of every question
+    All questions are resampled at once as a replicates x questions x
+    categories multinomial draw; with workers > 1 the replicates are split
+    across processes, each with an independent stream spawned from seed
+    Returns the lower and upper error bars, shape questions x 2 x categories,
+    in the yerr layout of ax.errorbar
+    """
+    n = counts.sum(axis=-1)
+    proportions = counts / np.maximum(n, 1)[:, np.newaxis]
+    streams = np.random.SeedSequence(seed).spawn(max(workers, 1))
+    sizes = [
+        len(part) for part in np.array_split(range(replicates), len(streams))
+    ]
+    jobs = [
+        (n, proportions, size, stream) for size, stream in zip(sizes, streams)
+    ]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            draws = list(executor.map(_bootstrap_counts, jobs))
+    else:
+        draws = [_bootstrap_counts(job) for job in jobs]
+    resampled = np.concatenate(draws) / np.maximum(n, 1)[:, np.newaxis]
+    lower, upper = np.quantile(
+        a=resampled,
+        q=[significance_level / 2, 1 - significance_level / 2],
+        axis=0
+    )
+    return np.stack([proportions - lower, upper - proportions], axis=1)
+
+
+def _bootstrap_counts(job: tuple) -> np.ndarray:
+    n, proportions, replicates, stream = job
+    rng = np.random.default_rng(stream)
+    return rng.multinomial(
+        n=n,
+        pvals=proportions,
+        size=(replicates, len(n))
+    )
+
+
+def supplier_segments(
+    *,
+    supplier: np.ndarray,
+    segment_table: pd.Series = None,
+    number_bands: int = 4
+) -> np.ndarray:
+    """
+    Returns the segment label of every respondent
+    segment_table maps a supplier id (index) to a segment (band, region,
+    tier); suppliers missing from it get no segment
+    Without a segment_table, suppliers are split into number_bands bands of
+    consecutive ids
+    """
+    if segment_table is not None:
+        return segment_table.reindex(supplier).to_numpy()
+    if number_bands < 1:
+        raise ValueError('number_bands must be at least 1 to band suppliers')
+    return pd.qcut(
+        x=supplier,
+        q=number_bands,
+        labels=[f'Band {band}' for band in range(1, number_bands + 1)]
+    ).astype(str)
+
+
+def crosstab_survey(
+    *,
+    survey: Survey,
+    segments: np.ndarray,
+    number_categories: int = 2,
+    significance_level: float = 0.05
+) -> pd.DataFrame:
+    """
+    Computes the proportion and t-interval of every segment x question x
+    answer cell with one grouped bincount over the response matrix
+    segments gives the segment label of every respondent
+    Returns a tidy table with one row per cell
+    """
+    codes, labels = pd.factorize(segments, sort=True)
+    counts = count_responses(
+        responses=survey.responses,
+        number_categories=number_categories,
+        groups=codes,
+        number_groups=len(labels)
+    )
+    proportions, half_widths = summarize_counts(
+        counts=counts,
+        significance_level=significance_level
+    )
+    index = pd.MultiIndex.from_product(
+        [labels, survey.question_numbers, range(1, number_categories + 1)],
+        names=['Segment', 'Question', 'Answer']
+    )
+    return pd.DataFrame(
+        data={
+            'Count': counts.ravel(),
+            'Proportion': proportions.ravel(),
+            'Half width': half_widths.ravel()
+        },
+        index=index
+    ).reset_index()
+
+
+def plot_crosstab(
+    *,
+    table: pd.DataFrame,
+    answer: int,
+    file_name: str,
+    figsize: Tuple[float, float]
+) -> None:
+    """
+    Draws a segment x question heatmap of the proportion of one answer
+    """
+    proportions = table[table['Answer'] == answer].pivot(
+        index='Segment',
+        columns='Question',
+        values='Proportion'
+    )
+    fig, ax = plt.subplots(
+        nrows=1,
+        ncols=1,
+        figsize=figsize
+    )
+    image = ax.imshow(
+        X=proportions.to_numpy(),
+        aspect='auto',
+        cmap='RdBu',
+        vmin=0,
+        vmax=1
+    )
+    fig.colorbar(mappable=image, ax=ax, label='Proportion')
+    ax.set_xticks(range(proportions.shape[1]))
+    ax.set_xticklabels(proportions.columns, rotation=90, fontsize=8)
+    ax.set_yticks(range(proportions.shape[0]))
+    ax.set_yticklabels(proportions.index, fontsize=8)
+    ax.set_xlabel(
+        xlabel='Question',
+        fontsize=12
+    )
+    ax.set_ylabel(
+        ylabel='Segment',
+        fontsize=12
+    )
+    fig.suptitle(
+        t=f'Proportion of answer {answer} by segment',
+        fontsize=15
+    )
+    fig.savefig(
+        fname=file_name,
+        format='svg'
+    )
+    plt.close(fig)
+
+
+def create_survey(
+    *,
+    size: int,
+    questions: List[str],
+    question_numbers: List[float],
+    question_columns: List[str],
+    number_categories: int = 2
+) -> Survey:
+    """
+    Creates a mock survey of size respondents with random answers coded
+    1..number_categories and lognormal spend weights
+    """
+    rng = np.random.default_rng()
+    responses = rng.integers(
+        low=1,
+        high=number_categories + 1,
+        size=(size, len(question_columns)),
+        dtype=np.uint8
+    )
+    return Survey(
+        responses=responses,
+        supplier=np.arange(1, size + 1, dtype=np.uint32),
+        questions=questions,
+        question_numbers=question_numbers,
+        question_columns=question_columns,
+        weights=rng.lognormal(mean=10, sigma=1, size=size)
+    )
+
+
+def survey_from_dataframe(
+    *,
+    df: pd.DataFrame,
+    questions: List[str],
+    question_numbers: List[float],
+    question_columns: List[str],
+    supplier_column: str = 'Supplier',
+    weight_column: str = None
+) -> Survey:
+    """
+    Packs the question columns of a dataframe into a compact Survey
+    Missing answers are stored as 0
+    Without a supplier column, the row number (index + 1) is the supplier id
+    weight_column names an optional design weight column; missing weights
+    are stored as 0
+    """
+    responses = np.ascontiguousarray(
+        df[question_columns].fillna(0).to_numpy(dtype=np.uint8)
+    )
+    if supplier_column in df.columns:
+        supplier = df[supplier_column].to_numpy()
+    else:
+        supplier = df.index.to_numpy() + 1
+    if weight_column is None:
+        weights = None
+    else:
+        weights = df[weight_column].fillna(0).to_numpy(dtype=np.float64)
+    return Survey(
+        responses=responses,
+        supplier=supplier,
+        questions=questions,
+        question_numbers=question_numbers,
+        question_columns=question_columns,
+        weights=weights
     )
-    return df
 
 
 if __name__ == '__main__':
@@ -0,0 +1,123 @@
+"""
+Content-hash figure cache
+
+A figure is keyed by a hash of its plot inputs (data arrays and styling
+parameters). Scripts compute the key before drawing; when restore_figure finds
+the key in the cache, the saved file is reused and the figure is not drawn.
+Entries are evicted least-recently-used first once the cache exceeds max_bytes.
+Styling that is hard-coded in the drawing code is keyed through source_key, so
+editing the drawing function invalidates its cached figures.
+
+    key = fc.figure_key(
+        x, y, title=title, figsize=figsize, format="svg",
+        code=fc.source_key(plot_graph)
+    )
+    if not fc.restore_figure(key=key, file_name="graph.svg"):
+        ...draw and fig.savefig(fname="graph.svg")...
+        fc.store_figure(key=key, file_name="graph.svg")
+"""
+
+from functools import lru_cache
+from pathlib import Path
+import hashlib
+import inspect
+import shutil
+import os
+
+import numpy as np
+
+
+CACHE_DIR = ".figure_cache"
+MAX_BYTES = 500_000_000
+
+
+def figure_key(*arrays, **parameters) -> str:
+    """
+    Returns a hex digest of the data arrays and the styling parameters
+    Arrays may be anything np.asarray accepts (ndarray, Series, Index, list)
+    """
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.asarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        if array.dtype == object:
+            digest.update(repr(array.tolist()).encode())
+        else:
+            digest.update(np.ascontiguousarray(array).tobytes())
+    digest.update(repr(sorted(parameters.items())).encode())
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def source_key(function) -> str:
+    """
+    Returns a hex digest of the source code of a drawing function
+    """
+    return hashlib.sha256(inspect.getsource(function).encode()).hexdigest()
+
+
+def restore_figure(
+    *,
+    key: str,
+    file_name: str,
+    cache_dir: str = CACHE_DIR
+) -> bool:
+    """
+    Copies the cached figure for key to file_name
+    Returns False on a cache miss or when cache_dir is None
+    An entry evicted by another process while it is copied is a miss
+    """
+    if cache_dir is None:
+        return False
+    entry = _entry(key=key, file_name=file_name, cache_dir=cache_dir)
+    try:
+        shutil.copyfile(src=entry, dst=file_name)
+        # the modification time records the last use for LRU eviction
+        os.utime(entry)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def store_figure(
+    *,
+    key: str,
+    file_name: str,
+    cache_dir: str = CACHE_DIR,
+    max_bytes: int = MAX_BYTES
+) -> None:
+    """
+    Copies a freshly saved figure into the cache under key, then evicts the
+    least-recently-used entries until the cache holds at most max_bytes
+    Does nothing when cache_dir is None
+    Entries that other processes evict during the scan are skipped
+    """
+    if cache_dir is None:
+        return
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    entry = _entry(key=key, file_name=file_name, cache_dir=cache_dir)
+    temporary = entry.with_suffix(f".{os.getpid()}.tmp")
+    shutil.copyfile(src=file_name, dst=temporary)
+    temporary.replace(entry)
+    entries = []
+    for path in Path(cache_dir).iterdir():
+        try:
+            status = path.stat()
+        except FileNotFoundError:
+            continue
+        if path.suffix != ".tmp":
+            entries.append((status.st_mtime, status.st_size, path))
+    entries.sort()
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total_bytes <= max_bytes or path == entry:
+            break
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
+
+
+def _entry(*, key: str, file_name: str, cache_dir: str) -> Path:
+    return Path(cache_dir) / f"{key}{Path(file_name).suffix}"
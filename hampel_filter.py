@@ -0,0 +1,111 @@
+#! /usr/bin/env python3
+"""
+Remove outliers with a Hampel filter
+
+Reads a csv file in chunks, removes the observations that are more than
+threshold scaled median absolute deviations from their rolling median, and
+writes the clean file and a file of the removed rows.
+
+./hampel_filter.py
+"""
+
+from pathlib import Path
+
+import spline_tools as st
+import pandas as pd
+import numpy as np
+
+
+def main():
+    hampel_file(
+        file_name="dataframe_large.csv",
+        clean_file_name="dataframe_large_clean.csv",
+        outlier_file_name="dataframe_large_outliers.csv",
+        columny="observed",
+        half_window=10,
+        threshold=3
+    )
+
+
+def hampel_file(
+    *,
+    file_name: str,
+    clean_file_name: str,
+    outlier_file_name: str,
+    columny: str,
+    half_window: int = 10,
+    threshold: float = 3,
+    chunk_size: int = 1_000_000
+) -> None:
+    """
+    Filters file_name chunk_size rows at a time
+    Each chunk is filtered with the half_window rows either side of it from
+    the neighbouring chunks, so the result does not depend on chunk_size,
+    which must be at least half_window
+    The outlier file holds the removed rows with their row number
+    """
+    if chunk_size < half_window:
+        raise ValueError("chunk_size must be at least half_window")
+    for path in (clean_file_name, outlier_file_name):
+        Path(path).unlink(missing_ok=True)
+    before = np.empty(0)
+    previous = None
+    for chunk in pd.read_csv(file_name, chunksize=chunk_size):
+        if previous is not None:
+            after = chunk[columny].to_numpy(dtype=np.float64)[:half_window]
+            before = _write_chunk(
+                df=previous,
+                before=before,
+                after=after,
+                columny=columny,
+                half_window=half_window,
+                threshold=threshold,
+                clean_file_name=clean_file_name,
+                outlier_file_name=outlier_file_name
+            )
+        previous = chunk
+    if previous is not None:
+        _write_chunk(
+            df=previous,
+            before=before,
+            after=np.empty(0),
+            columny=columny,
+            half_window=half_window,
+            threshold=threshold,
+            clean_file_name=clean_file_name,
+            outlier_file_name=outlier_file_name
+        )
+
+
+def _write_chunk(
+    *,
+    df: pd.DataFrame,
+    before: np.ndarray,
+    after: np.ndarray,
+    columny: str,
+    half_window: int,
+    threshold: float,
+    clean_file_name: str,
+    outlier_file_name: str
+) -> np.ndarray:
+    values = df[columny].to_numpy(dtype=np.float64)
+    mask = st.hampel_mask(
+        values=np.concatenate([before, values, after]),
+        half_window=half_window,
+        threshold=threshold
+    )[len(before):len(before) + len(values)]
+    header = not Path(clean_file_name).exists()
+    df[~mask].to_csv(clean_file_name, mode="a", header=header, index=False)
+    df[mask].to_csv(
+        outlier_file_name,
+        mode="a",
+        header=not Path(outlier_file_name).exists(),
+        index=True,
+        index_label="row"
+    )
+    print("rows", len(df), "outliers", int(mask.sum()))
+    return values[-half_window:]
+
+
+if __name__ == "__main__":
+    main()
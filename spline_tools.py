@@ -0,0 +1,862 @@
+"""
+Helpers shared by the cubic spline and exponentially weighted moving average
+scripts
+
+- Parse datetime columns with one vectorized call per column
+- Fit cubic splines to many series in a process pool
+- Cache fitted spline coefficients on disk, keyed by the fitted data and
+  recorded by file and columns
+- Fit very long series in parallel segments stitched at the joins
+- Clean series for fitting in O(n) when they are already sorted and unique
+- Decimate long series to the points a plot of a given size can show
+- Choose date ticks from the span of the data and the width of the plot
+- Resample long series into fixed time buckets before fitting
+- Flag outliers with a Hampel filter
+- Bootstrap percentile bands for a spline across a process pool
+- Evaluate values, derivatives, and integrals of a spline in chunks
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, List, NamedTuple, Tuple
+from functools import partial
+from pathlib import Path
+import hashlib
+import json
+import time
+import os
+
+from matplotlib.dates import AutoDateLocator, ConciseDateFormatter, \
+    DateFormatter, DayLocator
+from matplotlib.ticker import NullFormatter, NullLocator
+from scipy.interpolate import CubicSpline, PPoly
+import matplotlib.axes as axes
+import datasense as ds
+import pandas as pd
+import numpy as np
+
+
+DATE_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%m/%d/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M:%S",
+    "%m/%d/%Y",
+    "%d/%m/%Y"
+]
+SPLINE_CACHE_DIR = ".spline_cache"
+# date format of each file, detected once per process
+_date_format_cache: Dict[str, str] = {}
+
+
+class SeriesSpec(NamedTuple):
+    """
+    One series to fit: the file and the abscissa, ordinate, and predicted
+    column names; date_format is given when the abscissa is a datetime
+    With a bucket width, the series is resampled to bucket means first
+    Series longer than segment_size are fitted in segments by workers
+    processes
+    abscissa_dtype casts a non-datetime abscissa, such as "int", and
+    report prints ds.dataframe_info for the file as it is read
+    """
+    file_name: str
+    abscissa: str
+    ordinate: str
+    predicted: str
+    date_format: str = None
+    segment_size: int = None
+    bucket: str = None
+    workers: int = 1
+    abscissa_dtype: str = None
+    report: bool = False
+
+
+class SplineFit(NamedTuple):
+    """
+    A fitted series: the data with its predicted column, the spline, and
+    the seconds spent in each stage
+    """
+    spec: SeriesSpec
+    data: pd.DataFrame
+    spline: CubicSpline
+    seconds: Dict[str, float]
+
+
+def detect_date_format(
+    *,
+    series: pd.Series,
+    formats: List[str] = DATE_FORMATS,
+    sample_size: int = 100
+) -> str:
+    """
+    Returns the first format in formats that parses a sample of series
+    Raises ValueError when none of the formats fits
+    """
+    sample = series.dropna().head(sample_size)
+    for date_format in formats:
+        try:
+            pd.to_datetime(sample, format=date_format)
+        except (ValueError, TypeError):
+            continue
+        return date_format
+    raise ValueError(f"no date format in {formats} fits {series.name}")
+
+
+def parse_dates(
+    *,
+    series: pd.Series,
+    date_format: str = None,
+    file_name: str = None
+) -> pd.Series:
+    """
+    Parses a column of date strings to datetime64[ns] in one vectorized call,
+    instead of one datetime.strptime call per row
+    Without date_format, the format is detected from the first rows and
+    cached for file_name
+    """
+    if date_format is None:
+        key = f"{file_name}:{series.name}"
+        if key not in _date_format_cache:
+            _date_format_cache[key] = detect_date_format(series=series)
+        date_format = _date_format_cache[key]
+    return pd.to_datetime(series, format=date_format).astype("datetime64[ns]")
+
+
+def estimate_spline(
+    *,
+    df: pd.DataFrame,
+    columnx: str,
+    columny: str,
+    cache_dir: str = SPLINE_CACHE_DIR,
+    segment_size: int = None,
+    workers: int = 1,
+    name: str = None
+) -> CubicSpline:
+    """
+    Estimates the spline object for columnx, columny of a dataframe
+    Requires that columnx, columny be integer or float; a datetime64 columnx
+    is fitted as an int64 view of its nanoseconds, without a copy
+    Removes rows where there are missing values in columnx and columny
+    Removes duplicate rows
+    Sorts the dataframe by columnx in increasing order
+    The spline is loaded from cache_dir when the cleaned data were fitted
+    before, and saved there otherwise; cache_dir = None always refits
+    Series longer than segment_size are fitted by segmented_spline
+    With a name, such as spline_name gives, the key is recorded under it,
+    so load_spline(name=name) finds the spline without the data
+    """
+    x, y, removed = clean_series(
+        x=df[columnx].to_numpy(),
+        y=df[columny].to_numpy()
+    )
+    print("final dataframe", (len(x), 2),
+          "min", y.min(),
+          "max", y.max(),
+          "removed", removed)
+    if segment_size is not None and len(x) <= segment_size:
+        segment_size = None
+    key = spline_key(x=x, y=y, segment_size=segment_size)
+    if cache_dir is not None:
+        if name is not None:
+            record_spline(name=name, key=key, cache_dir=cache_dir)
+        spline = load_spline(key=key, cache_dir=cache_dir)
+        if spline is not None:
+            return spline
+    if segment_size is not None:
+        spline = segmented_spline(
+            x=x,
+            y=y,
+            segment_size=segment_size,
+            workers=workers
+        )
+    else:
+        spline = CubicSpline(x, y)
+    if cache_dir is not None:
+        save_spline(spline=spline, key=key, cache_dir=cache_dir)
+    return spline
+
+
+def as_int64(array: np.ndarray) -> np.ndarray:
+    """
+    Returns a datetime64[ns] array as an int64 view of its nanoseconds,
+    sharing memory with array; other arrays are returned unchanged
+    """
+    if array.dtype.kind == "M":
+        return array.astype("datetime64[ns]", copy=False).view(np.int64)
+    return array
+
+
+def clean_series(
+    *,
+    x: np.ndarray,
+    y: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, Dict[str, int]]:
+    """
+    Removes missing values, sorts by x, and keeps the first of duplicate x
+    One np.diff over x checks order and uniqueness; when the series is
+    already sorted and unique, x and y are returned as they are, without
+    a copy
+    A datetime64 x is returned as an int64 view, with NaT counted missing
+    Returns x, y, and the counts of missing rows, duplicate rows, and
+    descending steps that were found
+    """
+    removed = {"missing": 0, "duplicates": 0, "unsorted": 0}
+    missing = np.zeros(len(x), dtype=bool)
+    if x.dtype.kind == "M":
+        missing |= np.isnat(x)
+        x = as_int64(x)
+    for array in (x, y):
+        if array.dtype.kind == "f":
+            missing |= np.isnan(array)
+    if missing.any():
+        removed["missing"] = int(missing.sum())
+        x, y = x[~missing], y[~missing]
+    steps = np.diff(x)
+    if (steps > 0).all():
+        return x, y, removed
+    removed["unsorted"] = int((steps < 0).sum())
+    if removed["unsorted"]:
+        order = np.argsort(x, kind="stable")
+        x, y = x[order], y[order]
+        steps = np.diff(x)
+    first = np.concatenate([[True], steps != 0])
+    removed["duplicates"] = int((~first).sum())
+    if removed["duplicates"]:
+        x, y = x[first], y[first]
+    return x, y, removed
+
+
+def segmented_spline(
+    *,
+    x: np.ndarray,
+    y: np.ndarray,
+    segment_size: int = 1_000_000,
+    overlap: int = 100,
+    workers: int = 1
+) -> CubicSpline:
+    """
+    Fits a cubic spline to sorted, unique x in segments of about
+    segment_size points, so no single system spans the whole series
+    First, the slope at each join is taken from a spline fitted to the
+    overlap points either side of it. Then every segment is fitted with its
+    join slopes as clamped end conditions, so the stitched spline and its
+    first derivative are continuous at the joins. Both passes run in a
+    process pool when workers > 1.
+    Returns one CubicSpline over all of x, callable like a global fit
+    """
+    if segment_size <= 2 * overlap:
+        raise ValueError("segment_size must exceed twice the overlap")
+    n = len(x)
+    if n <= segment_size:
+        return CubicSpline(x, y)
+    joins = np.arange(segment_size, n - segment_size // 2, segment_size)
+    windows = [
+        (x[join - overlap:join + overlap + 1],
+         y[join - overlap:join + overlap + 1])
+        for join in joins
+    ]
+    slopes = _map(_join_slope, windows, workers=workers)
+    bounds = np.concatenate([[0], joins, [n - 1]])
+    end_conditions = ["not-a-knot"] + [(1, slope) for slope in slopes] + \
+        ["not-a-knot"]
+    segments = [
+        (x[start:stop + 1], y[start:stop + 1], (left, right))
+        for start, stop, left, right in zip(
+            bounds[:-1], bounds[1:], end_conditions[:-1], end_conditions[1:]
+        )
+    ]
+    coefficients = _map(_segment_coefficients, segments, workers=workers)
+    return CubicSpline.construct_fast(
+        np.concatenate(coefficients, axis=1),
+        np.asarray(x, dtype=np.float64),
+        extrapolate=True
+    )
+
+
+def _join_slope(window: tuple) -> float:
+    x, y = window
+    return float(CubicSpline(x, y)(x[len(x) // 2], 1))
+
+
+def _segment_coefficients(segment: tuple) -> np.ndarray:
+    x, y, bc_type = segment
+    return CubicSpline(x, y, bc_type=bc_type).c
+
+
+def _map(function: Callable, jobs: list, workers: int = 1) -> list:
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(function, jobs))
+    return [function(job) for job in jobs]
+
+
+def spline_key(
+    *,
+    x: np.ndarray,
+    y: np.ndarray,
+    segment_size: int = None
+) -> str:
+    """
+    Returns a hex digest of the cleaned abscissa and ordinate arrays and,
+    for a segmented fit, the segment size
+    """
+    digest = hashlib.sha256()
+    for array in (x, y):
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(array.tobytes())
+    if segment_size is not None:
+        digest.update(f"segment_size={segment_size}".encode())
+    return digest.hexdigest()
+
+
+def save_spline(
+    *,
+    spline: CubicSpline,
+    key: str,
+    cache_dir: str = SPLINE_CACHE_DIR
+) -> None:
+    """
+    Saves the breakpoints x and coefficients c of a fitted spline as two
+    .npy files, which load_spline memory maps
+    Each file is written under a per-process temporary name and renamed into
+    place, so processes saving the same key do not collide
+    """
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    for name, array in (("x", spline.x), ("c", spline.c)):
+        path = Path(cache_dir) / f"{key}_{name}.npy"
+        temporary = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(temporary, "wb") as file:
+            np.save(file, array)
+        temporary.replace(path)
+
+
+def load_spline(
+    *,
+    key: str = None,
+    name: str = None,
+    cache_dir: str = SPLINE_CACHE_DIR
+) -> CubicSpline:
+    """
+    Returns the cached spline for key, or for the key recorded under name,
+    without refitting, or None on a miss
+    The coefficient arrays are memory mapped, so only the pieces that are
+    evaluated are read from disk
+    """
+    if key is None:
+        key = named_key(name=name, cache_dir=cache_dir)
+        if key is None:
+            return None
+    paths = [Path(cache_dir) / f"{key}_{name}.npy" for name in ("x", "c")]
+    if not all(path.exists() for path in paths):
+        return None
+    x, c = (np.load(path, mmap_mode="r") for path in paths)
+    return CubicSpline.construct_fast(c, x, extrapolate=True)
+
+
+def spline_name(
+    *,
+    file_name: str,
+    columnx: str,
+    columny: str,
+    bucket: str = None
+) -> str:
+    """
+    Returns the name under which the spline of a file's columns is recorded
+    """
+    name = f"{Path(file_name).name}:{columnx}:{columny}"
+    return name if bucket is None else f"{name}:{bucket}"
+
+
+def record_spline(
+    *,
+    name: str,
+    key: str,
+    cache_dir: str = SPLINE_CACHE_DIR
+) -> None:
+    """
+    Records key as the latest spline fitted for name
+    Each name has its own small manifest file, replaced atomically, so
+    processes fitting different series do not overwrite each other
+    """
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    path = _manifest_path(name=name, cache_dir=cache_dir)
+    temporary = path.with_suffix(f".{os.getpid()}.tmp")
+    temporary.write_text(json.dumps({"name": name, "key": key}))
+    temporary.replace(path)
+
+
+def named_key(*, name: str, cache_dir: str = SPLINE_CACHE_DIR) -> str:
+    """
+    Returns the key recorded for name, or None when there is none
+    """
+    path = _manifest_path(name=name, cache_dir=cache_dir)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())["key"]
+
+
+def _manifest_path(*, name: str, cache_dir: str) -> Path:
+    digest = hashlib.sha256(name.encode()).hexdigest()
+    return Path(cache_dir) / f"{digest}_name.json"
+
+
+def fit_series(spec: SeriesSpec) -> SplineFit:
+    """
+    Reads one series, fits a cubic spline, and adds the predicted column
+    A datetime abscissa is fitted through an int64 view of its nanoseconds,
+    so the column keeps its datetime64 dtype for plotting
+    """
+    seconds = {}
+    start = time.perf_counter()
+    df = ds.read_file(file_name=spec.file_name)
+    if spec.date_format is not None:
+        df[spec.abscissa] = parse_dates(
+            series=df[spec.abscissa],
+            date_format=spec.date_format,
+            file_name=spec.file_name
+        )
+    elif spec.abscissa_dtype is not None:
+        df[spec.abscissa] = df[spec.abscissa].astype(dtype=spec.abscissa_dtype)
+    seconds["read"] = time.perf_counter() - start
+    if spec.report:
+        df = ds.dataframe_info(df=df, file_in=spec.file_name)
+    print("initial dataframe", spec.file_name, df.shape,
+          "min", df[spec.ordinate].min(),
+          "max", df[spec.ordinate].max())
+    if spec.bucket is not None:
+        start = time.perf_counter()
+        df = resample_buckets(
+            df=df,
+            columnx=spec.abscissa,
+            columny=spec.ordinate,
+            bucket=spec.bucket
+        )
+        seconds["resample"] = time.perf_counter() - start
+    start = time.perf_counter()
+    spline = estimate_spline(
+        df=df,
+        columnx=spec.abscissa,
+        columny=spec.ordinate,
+        segment_size=spec.segment_size,
+        workers=spec.workers,
+        name=spline_name(
+            file_name=spec.file_name,
+            columnx=spec.abscissa,
+            columny=spec.ordinate,
+            bucket=spec.bucket
+        )
+    )
+    x = df[spec.abscissa].to_numpy()
+    predicted = spline(as_int64(x))
+    if x.dtype.kind == "M":
+        predicted[np.isnat(x)] = np.nan
+    df[spec.predicted] = predicted
+    seconds["fit"] = time.perf_counter() - start
+    return SplineFit(spec=spec, data=df, spline=spline, seconds=seconds)
+
+
+def fit_batch(
+    *,
+    specs: List[SeriesSpec],
+    workers: int = 1,
+    plot: Callable[[SplineFit], None] = None
+) -> List[SplineFit]:
+    """
+    Fits every series of specs, in a process pool when workers > 1
+    plot, a module-level function of a SplineFit, draws each fit in the
+    worker that fitted it
+    Returns the fits in the order of specs
+    """
+    job = partial(_fit_and_plot, plot=plot)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(job, specs))
+    return [job(spec) for spec in specs]
+
+
+def _fit_and_plot(
+    spec: SeriesSpec,
+    plot: Callable[[SplineFit], None]
+) -> SplineFit:
+    fit = fit_series(spec)
+    if plot is not None:
+        start = time.perf_counter()
+        plot(fit)
+        fit.seconds["plot"] = time.perf_counter() - start
+    return fit
+
+
+def line_index(
+    *,
+    x: np.ndarray,
+    y: np.ndarray,
+    columns: int
+) -> np.ndarray:
+    """
+    Returns the indices, in increasing x, of the points that a line plot
+    of x, y needs at a width of columns pixels: the first, last, minimum,
+    and maximum point of every pixel column (M4 decimation)
+    The decimated line draws the same pixels as the full line, up to
+    anti-aliasing; pass about twice the pixel width as columns
+    """
+    x, y, kept = _valid_points(x=x, y=y)
+    if (np.diff(x[kept]) < 0).any():
+        kept = kept[np.argsort(x[kept], kind="stable")]
+    if len(kept) <= 4 * columns:
+        return kept
+    x, y = x[kept], y[kept]
+    starts = _bin_starts(x=x, columns=columns)
+    stops = np.append(starts[1:], len(x)) - 1
+    segment = np.repeat(np.arange(len(starts)), stops - starts + 1)
+    position = np.arange(len(x))
+    lowest = np.minimum.reduceat(y, starts)[segment]
+    highest = np.maximum.reduceat(y, starts)[segment]
+    minimum = np.minimum.reduceat(
+        np.where(y == lowest, position, len(x)),
+        starts
+    )
+    maximum = np.minimum.reduceat(
+        np.where(y == highest, position, len(x)),
+        starts
+    )
+    return kept[
+        np.unique(np.concatenate([starts, stops, minimum, maximum]))
+    ]
+
+
+def marker_index(
+    *,
+    x: np.ndarray,
+    y: np.ndarray,
+    columns: int,
+    rows: int
+) -> np.ndarray:
+    """
+    Returns the indices of the points that a marker plot of x, y needs at
+    columns x rows pixels: the first point in every occupied pixel
+    """
+    x, y, kept = _valid_points(x=x, y=y)
+    if len(kept) <= columns:
+        return kept
+    x, y = x[kept], y[kept]
+    column = _pixel(values=x, pixels=columns)
+    row = _pixel(values=y, pixels=rows)
+    _, first = np.unique(column * rows + row, return_index=True)
+    return kept[np.sort(first)]
+
+
+def _valid_points(
+    *,
+    x: np.ndarray,
+    y: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # returns x as int64 and the indices of the points with no NaT or NaN;
+    # NaT viewed as int64 is the minimum int64, so it must not be binned
+    x, y = np.asarray(x), np.asarray(y, dtype=np.float64)
+    missing = np.isnan(y)
+    if x.dtype.kind == "M":
+        missing |= np.isnat(x)
+    elif x.dtype.kind == "f":
+        missing |= np.isnan(x)
+    return as_int64(x), y, np.flatnonzero(~missing)
+
+
+def _pixel(*, values: np.ndarray, pixels: int) -> np.ndarray:
+    low = values.min()
+    span = float(values.max() - low) or 1.0
+    return np.minimum(
+        ((values - low) / span * pixels).astype(np.int64),
+        pixels - 1
+    )
+
+
+def _bin_starts(*, x: np.ndarray, columns: int) -> np.ndarray:
+    column = _pixel(values=x, pixels=columns)
+    return np.flatnonzero(np.diff(column, prepend=-1))
+
+
+def set_date_axis(
+    *,
+    ax: axes.Axes,
+    x: np.ndarray,
+    dateformat: str,
+    ticks_per_inch: float = 1.25
+) -> None:
+    """
+    Sets the major date ticks of the x axis from the span of x and the
+    width of the axes, capped at ticks_per_inch
+    A span of no more days than the cap keeps one dateformat tick per day;
+    longer spans get an AutoDateLocator with a ConciseDateFormatter, so the
+    number of tick labels stays the same however long the series
+    """
+    width = ax.get_position().width * ax.figure.get_figwidth()
+    max_ticks = max(3, int(width * ticks_per_inch))
+    x = as_int64(np.asarray(x))
+    days = (x.max() - x.min()) / 86_400e9
+    if days <= max_ticks:
+        ax.xaxis.set_major_locator(DayLocator())
+        ax.xaxis.set_major_formatter(DateFormatter(dateformat))
+    else:
+        locator = AutoDateLocator(minticks=3, maxticks=max_ticks)
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+    ax.xaxis.set_minor_locator(NullLocator())
+    ax.xaxis.set_minor_formatter(NullFormatter())
+
+
+def resample_buckets(
+    *,
+    df: pd.DataFrame,
+    columnx: str,
+    columny: str,
+    bucket
+) -> pd.DataFrame:
+    """
+    Bins columnx into fixed buckets and returns one row per occupied
+    bucket: the bucket centre in columnx, the mean in columny, and the
+    min, max, and count of columny
+    bucket is a width such as "1min" or "1h" for a datetime columnx, or a
+    number for a numeric columnx
+    Missing values are dropped and the data sorted once, keeping every
+    observation of a repeated x, then every statistic is one reduceat pass
+    over the bucket boundaries
+    """
+    datetimes = df[columnx].dtype.kind == "M"
+    x, y, kept = _valid_points(
+        x=df[columnx].to_numpy(),
+        y=df[columny].to_numpy(dtype=np.float64)
+    )
+    x, y = x[kept], y[kept]
+    if (np.diff(x) < 0).any():
+        order = np.argsort(x, kind="stable")
+        x, y = x[order], y[order]
+    width = pd.Timedelta(bucket).value if datetimes else bucket
+    bins = x // width
+    starts = np.flatnonzero(np.diff(bins, prepend=bins[0] - 1))
+    count = np.diff(np.append(starts, len(x)))
+    centre = bins[starts] * width + width // 2 if datetimes else \
+        bins[starts] * width + width / 2
+    resampled = pd.DataFrame(
+        data={
+            columnx: centre.astype("datetime64[ns]") if datetimes else centre,
+            columny: np.add.reduceat(y, starts) / count,
+            "min": np.minimum.reduceat(y, starts),
+            "max": np.maximum.reduceat(y, starts),
+            "count": count
+        }
+    )
+    print("resampled", len(x), "rows to", len(resampled), "buckets of", bucket)
+    return resampled
+
+
+def hampel_mask(
+    *,
+    values: np.ndarray,
+    half_window: int = 10,
+    threshold: float = 3
+) -> np.ndarray:
+    """
+    Returns True for the values more than threshold scaled median absolute
+    deviations from the median of the 2 * half_window + 1 values centred
+    on them (Hampel filter)
+    The rolling median and MAD are taken over a sliding-window view, with
+    the ends padded by reflection
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) <= half_window:
+        return np.zeros(len(values), dtype=bool)
+    windows = np.lib.stride_tricks.sliding_window_view(
+        np.pad(values, half_window, mode="reflect"),
+        window_shape=2 * half_window + 1
+    )
+    median = np.median(windows, axis=1)
+    deviation = np.abs(windows - median[:, np.newaxis])
+    mad = 1.4826 * np.median(deviation, axis=1)
+    return np.abs(values - median) > threshold * mad
+
+
+class SplineBands(NamedTuple):
+    """
+    Bootstrap refits of a spline evaluated on a shared grid: curves is
+    replicates x grid, and lower, upper are the percentile bands
+    """
+    grid: np.ndarray
+    curves: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+
+
+# arrays shared with the bootstrap workers, attached once per process
+_shared: Dict[str, np.ndarray] = {}
+_shared_blocks: List[SharedMemory] = []
+
+
+def bootstrap_bands(
+    *,
+    x: np.ndarray,
+    y: np.ndarray,
+    replicates: int = 1000,
+    grid_size: int = 500,
+    percentiles: Tuple[float, float] = (2.5, 97.5),
+    method: str = "pairs",
+    window: int = 11,
+    workers: int = 1,
+    seed: int = None
+) -> SplineBands:
+    """
+    Percentile bands for a cubic spline from replicates refits on
+    resampled series
+    method "pairs" refits on the unique points of a resample with
+    replacement, always keeping the end points so no refit extrapolates over
+    the grid; method "residuals" refits on a centred moving average of
+    window points plus its resampled residuals, since the residuals about
+    an interpolating spline are all zero
+    With workers > 1 the replicates are split across processes, each with an
+    independent stream spawned from seed. The series, the grid, and the
+    replicates x grid curves are held in shared memory, so the workers read
+    the data and write their curves without pickling them.
+    A datetime64 x gives a datetime64 grid
+    """
+    if method not in ("pairs", "residuals"):
+        raise ValueError("method must be 'pairs' or 'residuals'")
+    x_clean, y_clean, _ = clean_series(x=np.asarray(x), y=np.asarray(y))
+    arrays = {
+        "x": np.asarray(x_clean, dtype=np.float64),
+        "y": np.asarray(y_clean, dtype=np.float64)
+    }
+    if method == "residuals":
+        half = window // 2
+        arrays["centre"] = np.lib.stride_tricks.sliding_window_view(
+            np.pad(arrays["y"], half, mode="reflect"),
+            window_shape=2 * half + 1
+        ).mean(axis=1)
+        arrays["residuals"] = arrays["y"] - arrays["centre"]
+    arrays["grid"] = np.linspace(arrays["x"][0], arrays["x"][-1], grid_size)
+    arrays["curves"] = np.empty((replicates, grid_size))
+    streams = np.random.SeedSequence(seed).spawn(max(workers, 1))
+    bounds = np.linspace(0, replicates, len(streams) + 1).astype(int)
+    jobs = [
+        (start, stop, method, stream)
+        for start, stop, stream in zip(bounds[:-1], bounds[1:], streams)
+    ]
+    if workers > 1:
+        blocks, specs = [], {}
+        try:
+            for name, array in arrays.items():
+                block = SharedMemory(create=True, size=max(array.nbytes, 1))
+                blocks.append(block)
+                np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = \
+                    array
+                specs[name] = (block.name, array.shape, array.dtype.str)
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_attach_shared,
+                initargs=(specs,)
+            ) as executor:
+                list(executor.map(_bootstrap_curves, jobs))
+            curves = np.ndarray(
+                arrays["curves"].shape,
+                buffer=blocks[-1].buf
+            ).copy()
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+    else:
+        _shared.update(arrays)
+        try:
+            for job in jobs:
+                _bootstrap_curves(job)
+        finally:
+            _shared.clear()
+        curves = arrays["curves"]
+    lower, upper = np.percentile(curves, percentiles, axis=0)
+    grid = arrays["grid"]
+    if np.asarray(x).dtype.kind == "M":
+        grid = grid.astype(np.int64).view("datetime64[ns]")
+    return SplineBands(grid=grid, curves=curves, lower=lower, upper=upper)
+
+
+def _attach_shared(specs: Dict[str, tuple]) -> None:
+    for name, (block_name, shape, dtype) in specs.items():
+        block = SharedMemory(name=block_name)
+        _shared_blocks.append(block)
+        _shared[name] = np.ndarray(shape, dtype, buffer=block.buf)
+
+
+def _bootstrap_curves(job: tuple) -> None:
+    start, stop, method, stream = job
+    rng = np.random.default_rng(stream)
+    x, y, grid = _shared["x"], _shared["y"], _shared["grid"]
+    for row in range(start, stop):
+        if method == "pairs":
+            index = np.unique(np.concatenate([
+                [0, len(x) - 1],
+                rng.integers(0, len(x), size=len(x))
+            ]))
+            spline = CubicSpline(x[index], y[index])
+        else:
+            residuals = rng.choice(_shared["residuals"], size=len(x))
+            spline = CubicSpline(x, _shared["centre"] + residuals)
+        _shared["curves"][row] = spline(grid)
+
+
+class SplineModel(NamedTuple):
+    """
+    A fitted spline with its first and second derivatives and its
+    antiderivative, built once by spline_model and reused for every query
+    """
+    spline: CubicSpline
+    first: PPoly
+    second: PPoly
+    integral: PPoly
+
+
+class SplineValues(NamedTuple):
+    """
+    The values, first and second derivatives, and cumulative integrals from
+    the first breakpoint of a spline at the query points
+    """
+    value: np.ndarray
+    first: np.ndarray
+    second: np.ndarray
+    integral: np.ndarray
+
+
+def spline_model(spline: CubicSpline) -> SplineModel:
+    """
+    Precomputes the derivative and antiderivative polynomials of spline
+    """
+    return SplineModel(
+        spline=spline,
+        first=spline.derivative(1),
+        second=spline.derivative(2),
+        integral=spline.antiderivative(1)
+    )
+
+
+def evaluate_spline(
+    *,
+    model: SplineModel,
+    x: np.ndarray,
+    chunk_size: int = 1_000_000
+) -> SplineValues:
+    """
+    Evaluates the value, first and second derivatives, and cumulative
+    integral of model at every x, chunk_size points at a time, so the
+    temporary arrays stay bounded however many points are queried
+    A datetime64 x is evaluated through an int64 view of its nanoseconds;
+    derivatives are then per nanosecond
+    """
+    x = as_int64(np.asarray(x))
+    values = SplineValues(*(np.empty(len(x)) for _ in SplineValues._fields))
+    polynomials = (model.spline, model.first, model.second, model.integral)
+    for start in range(0, len(x), chunk_size):
+        chunk = x[start:start + chunk_size]
+        for polynomial, out in zip(polynomials, values):
+            out[start:start + chunk_size] = polynomial(chunk)
+    return values
@@ -10,6 +10,7 @@ TODO: add code to read an Excel or csv file.
 """
 
 import matplotlib.pyplot as plt
+import figure_cache as fc
 import datasense as ds
 import numpy as np
 
@@ -40,30 +41,51 @@ def main():
     step = df_blank.reset_index(drop=True).repeat(3).shift(-1)
     step[1::3] = np.nan
     df_blank.loc[LAST_COLUMN] = 0
-    fig, ax = plt.subplots()
-    x = df.index  # bar positions
-    # create the waterfall chart, no need for a stacked argument
-    ax.bar(x=x, height=df[amount], width=0.4, bottom=df_blank)
-    ax.set_ylim(YLIM_MIN, YLIM_MAX)
-    # set bar colors based on values
-    for i, p in enumerate(ax.patches):
-        if df.iloc[i][amount] > 0:
-            p.set_facecolor(POSITIVE_COLOUR)
-        else:
-            p.set_facecolor(NEGATIVE_COLOUR)
-    # Change color of the first and last bars
-    # ax.patches contains a list of bar objects in the plot
-    ax.patches[0].set_facecolor(FIRST_BAR_COLOUR)
-    ax.patches[-1].set_facecolor(LAST_BAR_COLOUR)
-    ax.plot(step.index, step.values, "b", linewidth=0.5)
-    ax.tick_params(axis="x", labelsize=14, labelrotation=90)
-    ax.tick_params(axis="y", labelsize=14)
-    ax.grid(visible=True, which="major", axis="y", alpha=GRID_ALPHA)
-    ax.set_ylabel(ylabel=ylabel, weight="bold", fontsize=16)
-    ax.set_xlabel(xlabel=xlabel, weight="bold", fontsize=16)
-    ax.set_title(label=TITLE, weight="bold", fontsize=18)
-    ds.despine(ax=ax)
-    fig.savefig(fname=PATH_GRAPH_SVG, format=FORMAT, bbox_inches="tight")
+    key = fc.figure_key(
+        df.index.astype(str),
+        df[amount],
+        df_blank,
+        step,
+        first_bar_colour=FIRST_BAR_COLOUR,
+        title=TITLE,
+        last_bar_colour=LAST_BAR_COLOUR,
+        positive_colour=POSITIVE_COLOUR,
+        negative_colour=NEGATIVE_COLOUR,
+        last_column=LAST_COLUMN,
+        ylim_min=YLIM_MIN,
+        ylim_max=YLIM_MAX,
+        grid_alpha=GRID_ALPHA,
+        format=FORMAT,
+        xlabel=xlabel,
+        ylabel=ylabel,
+        code=fc.source_key(main)
+    )
+    if not fc.restore_figure(key=key, file_name=PATH_GRAPH_SVG):
+        fig, ax = plt.subplots()
+        x = df.index  # bar positions
+        # create the waterfall chart, no need for a stacked argument
+        ax.bar(x=x, height=df[amount], width=0.4, bottom=df_blank)
+        ax.set_ylim(YLIM_MIN, YLIM_MAX)
+        # set bar colors based on values
+        for i, p in enumerate(ax.patches):
+            if df.iloc[i][amount] > 0:
+                p.set_facecolor(POSITIVE_COLOUR)
+            else:
+                p.set_facecolor(NEGATIVE_COLOUR)
+        # Change color of the first and last bars
+        # ax.patches contains a list of bar objects in the plot
+        ax.patches[0].set_facecolor(FIRST_BAR_COLOUR)
+        ax.patches[-1].set_facecolor(LAST_BAR_COLOUR)
+        ax.plot(step.index, step.values, "b", linewidth=0.5)
+        ax.tick_params(axis="x", labelsize=14, labelrotation=90)
+        ax.tick_params(axis="y", labelsize=14)
+        ax.grid(visible=True, which="major", axis="y", alpha=GRID_ALPHA)
+        ax.set_ylabel(ylabel=ylabel, weight="bold", fontsize=16)
+        ax.set_xlabel(xlabel=xlabel, weight="bold", fontsize=16)
+        ax.set_title(label=TITLE, weight="bold", fontsize=18)
+        ds.despine(ax=ax)
+        fig.savefig(fname=PATH_GRAPH_SVG, format=FORMAT, bbox_inches="tight")
+        fc.store_figure(key=key, file_name=PATH_GRAPH_SVG)
     print(df)
 
 